@@ -0,0 +1,92 @@
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent)) # run from anywhere: python benchmarks/bench_batchtable.py
+
+import ordering  # noqa: E402
+from batchtable import BatchTable  # noqa: E402
+from mapicture import Photo  # noqa: E402
+from renamer import RenameEngine, get_tag_dict_list  # noqa: E402
+from template import NameTemplate  # noqa: E402
+
+# Ordering and naming a whole batch: BatchTable (NumPy columns) vs. the per photo path (sort records + template).
+# The photos are made up in memory, so only the batch steps are timed and no files are needed.
+# usage: python benchmarks/bench_batchtable.py [number of rows]
+
+numRows = 1000000
+tags = ["YYYY-MM-DD", "hh-mm-ss", "####", "holiday"]
+models = ["Canon EOS R5", "NIKON Z 6", "iPhone 13", "Pixel 7", None]
+start2015 = 1420070400
+
+
+def get_photos(count:int, seed:int = 0) -> list:
+# photos in 200 directories, a third of them shares a handful of timestamps (like burst shots)
+    rng = random.Random(seed)
+    photos = []
+    for index in range(count):
+        photo = Photo.__new__(Photo)
+        photo._path = f"/photos/{rng.randrange(200):03d}/IMG_{index:07d}.jpg"
+        photo._pathOld = photo._path
+        photo._fileType = ".jpg"
+        photo._timestamp = start2015 + (rng.randrange(5) if rng.random() < 0.3 else rng.randrange(315360000))
+        photo._subSec = rng.randrange(1000) * 1000
+        photo._model = rng.choice(models)
+        photo._gps = None
+        photo._size = rng.randrange(1000000, 8000000)
+        photo._mtimeNs = 0
+        photo._birthtime = None
+        photo._id = 0
+        photos.append(photo)
+    return photos
+
+
+def per_photo(photos:list, scope:str, engine:RenameEngine) -> list:
+    records = [photo.get_sort_record(scope, str(photo.get_path())) for photo in photos]
+    iteratorIds, digits = ordering.get_iterator_ids(records)
+    template = NameTemplate(get_sized_tags(engine, digits), engine.defaultSeparator, engine)
+    for photo in photos:
+        photo.set_iterator_id(iteratorIds[str(photo.get_path())])
+    return template.render_many(photos)
+
+
+def batch(photos:list, scope:str, engine:RenameEngine) -> list:
+    table = BatchTable.from_photos(photos)
+    ids, digits = table.get_iterator_ids(scope)
+    template = NameTemplate(get_sized_tags(engine, digits), engine.defaultSeparator, engine)
+    return table.render_names(template, ids)
+
+
+def get_sized_tags(engine:RenameEngine, digits:int) -> list:
+    engine.iteratorDigits = digits
+    return engine.get_sized_tags(engine.tagDictList)
+
+
+def measure(label:str, function, *args) -> list:
+    start = time.perf_counter()
+    names = function(*args)
+    duration = time.perf_counter() - start
+    print(f"{label}: {len(names) / duration:,.0f} rows/s ({duration:.3f} s for {len(names)} rows)")
+    return names
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else numRows
+    engine = RenameEngine()
+    engine.tagDictList = get_tag_dict_list(tags)
+    photos = get_photos(count)
+
+    for scope in (ordering.scopeGlobal, ordering.scopeDay, ordering.scopeDirectory):
+        expected = measure(f"per photo [{scope}]", per_photo, photos, scope, engine)
+        names = measure(f"batch table [{scope}]", batch, photos, scope, engine)
+        assert names == expected, f"batch table names differ from the per photo names ({scope})"
+
+    table = BatchTable.from_photos(photos)
+    start = time.perf_counter()
+    days, counts = table.count_by_day()
+    print(f"batch table count_by_day: {len(days)} days in {time.perf_counter() - start:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import gc
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent)) # run from anywhere: python benchmarks/bench_memory.py
+
+from corpus import make_corpus  # noqa: E402
+from fileinfo import get_photo_metadata  # noqa: E402
+from mapicture import Photo  # noqa: E402
+
+# Retained bytes per photo: the slotted Photo vs. the old one, which kept the raw exif, the stat_result,
+# two Path objects and a dict of strings for every file (rebuilt below as LegacyPhoto).
+# usage: python benchmarks/bench_memory.py [number of files]
+
+numFiles = 2000
+
+
+class LegacyPhoto:
+    def __init__(self, filepath, metadata):
+        self._path = Path(filepath)
+        self._exif = metadata.exif
+        self._stat = metadata.stat
+        self._dateTimeStrTpl = metadata.dateTimeStrTpl
+        self._model = metadata.model
+        self._gps = metadata.gps
+        self._subSec = metadata.subSec
+        self._timestamp = None
+        self.attributes = {
+            "id": int(),
+            "name": self._path.name,
+            "name_old": self._path.name,
+            "name_new": str(),
+            "path": Path(filepath),
+            "path_new": None,
+            "path_old": Path(filepath),
+            "was_renamed": False,
+            "date_time": self._dateTimeStrTpl.date + " " + self._dateTimeStrTpl.time,
+            "YYYY": self._dateTimeStrTpl.YYYY,
+            "MM": self._dateTimeStrTpl.MM,
+            "DD": self._dateTimeStrTpl.DD,
+            "hh": self._dateTimeStrTpl.hh,
+            "mm": self._dateTimeStrTpl.mm,
+            "ss": self._dateTimeStrTpl.ss,
+            "file_type": self._path.suffix
+        }
+
+
+def measure(label:str, function, filepaths:list):
+# bytes still allocated after building a photo for every file, i.e. what a batch keeps alive
+    gc.collect()
+    tracemalloc.start()
+    photos = function(filepaths)
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label}: {retained / len(photos):,.0f} bytes per photo ({retained / 1048576:.1f} MiB for {len(photos)} photos)")
+    return retained
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else numFiles
+    with tempfile.TemporaryDirectory() as directory:
+        filepaths = [str(path) for path in make_corpus(directory, count)]
+        Photo(filepaths[0]) # warm up imports and caches before measuring
+        legacy = measure("legacy photo", lambda filepaths: [LegacyPhoto(path, get_photo_metadata(path)) for path in filepaths], filepaths)
+        compact = measure("slotted photo", lambda filepaths: [Photo(path) for path in filepaths], filepaths)
+        print(f"{compact / legacy:.0%} of the legacy size")
+
+
+if __name__ == "__main__":
+    main()
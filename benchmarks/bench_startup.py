@@ -0,0 +1,45 @@
+import subprocess
+import sys
+from pathlib import Path
+
+# Cold start: time to import the entry points in a fresh interpreter (best of several runs).
+# "eager format table" is what importing mapicture cost before the static table in formats.py,
+# when every PIL plugin was initialized at import time.
+
+repeat = 5
+rootDir = Path(__file__).resolve().parent.parent
+
+cases = {
+    "mapicture": "import mapicture",
+    "mapicture + eager format table": "import mapicture, utilities; utilities.get_PIL_supported_formats()",
+    "cli": "import cli",
+    "renamer": "import renamer",
+    "customtkinter": "import customtkinter",
+    "main (window classes)": "import main",
+}
+
+timerCode = "import time; start = time.perf_counter(); {code}; print(time.perf_counter() - start)"
+
+
+def measure(code:str) -> float:
+# fastest of repeat fresh interpreters, None if the import fails (e.g. no customtkinter)
+    durations = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", timerCode.format(code=code)], cwd=rootDir, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        durations.append(float(result.stdout.strip().splitlines()[-1]))
+    return min(durations)
+
+
+def main():
+    for label, code in cases.items():
+        duration = measure(code)
+        if duration is None:
+            print(f"{label}: import failed")
+        else:
+            print(f"{label}: {duration * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent)) # run from anywhere: python benchmarks/bench_template.py
+
+import utilities as util  # noqa: E402
+from mapicture import Photo  # noqa: E402
+from renamer import RenameEngine, get_tag_dict_list  # noqa: E402
+from template import NameTemplate  # noqa: E402
+
+# Names per second: compiled NameTemplate vs. walking the tag list for every photo (the old Photo.generate_name)
+
+numPhotos = 100000
+tags = ["YYYY-MM-DD", "hh-mm-ss", "####", "holiday"]
+
+
+def legacy_generate_name(photo:Photo, app:object) -> str:
+    tagList = []
+    for tag in app.tagDictList:
+        text = tag["text"]
+        match tag["category"]:
+            case app._categoryDate:
+                text = photo.adjust_date_tag(text)
+            case app._categoryTime:
+                text = photo.adjust_time_tag(text)
+            case app._categoryIterator:
+                text = photo.adjust_iterator_tag(text)
+        tagList.insert(int(tag["index"]), text)
+    return util.concat_strings(tagList, app.defaultSeparator) + photo.get_file_type()
+
+
+def get_photos(count:int) -> list:
+    with tempfile.TemporaryDirectory() as directory:
+        filepath = Path(directory) / "IMG_0.jpg"
+        exif = Image.Exif()
+        exif[306] = "2023:05:01 12:30:00"
+        Image.new("RGB", (8, 8)).save(filepath, exif=exif)
+        photo = Photo(filepath)
+        photos = []
+        for index in range(count): # same metadata, different ids, without reading the file again
+            copy = Photo.__new__(Photo)
+            for slot in Photo.__slots__:
+                setattr(copy, slot, getattr(photo, slot))
+            copy.set_iterator_id(index + 1)
+            photos.append(copy)
+    return photos
+
+
+def measure(label:str, function, photos:list) -> list:
+    start = time.perf_counter()
+    names = function(photos)
+    duration = time.perf_counter() - start
+    print(f"{label}: {len(photos) / duration:,.0f} names/s ({duration:.3f} s for {len(photos)} photos)")
+    return names
+
+
+def main():
+    engine = RenameEngine()
+    engine.tagDictList = get_tag_dict_list(tags)
+    photos = get_photos(numPhotos)
+
+    legacy = measure("per photo tag walk", lambda photos: [legacy_generate_name(photo, engine) for photo in photos], photos)
+    compiled = measure("compiled template", NameTemplate(engine.tagDictList, engine.defaultSeparator, engine).render_many, photos)
+    assert legacy == compiled, "template output differs from the old naming"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent)) # run from anywhere: python benchmarks/bench_thumbnails.py
+
+from corpus import make_corpus  # noqa: E402
+from settings import Settings  # noqa: E402
+from thumbnails import ThumbnailLoader, make_thumbnail  # noqa: E402
+
+# Previews per second: full decode (what a naive preview costs) vs. draft decode vs. the loader with a warm disk cache.
+# Only the JPEGs of the corpus are used, draft decoding doesn't apply to the other formats.
+# usage: python benchmarks/bench_thumbnails.py [number of files]
+
+numFiles = 200
+imageSize = (4000, 3000) # 12 megapixels
+
+
+def full_decode(filepath):
+    with Image.open(filepath) as image:
+        image = image.convert("RGB")
+        image.thumbnail((Settings.thumbnailSize, Settings.thumbnailSize))
+        return image
+
+
+def load_all(loader:ThumbnailLoader, filepaths:list):
+    loader.request(filepaths)
+    while loader.is_busy():
+        loader.get_finished()
+        time.sleep(0.001)
+
+
+def measure(label:str, function, count:int):
+    start = time.perf_counter()
+    function()
+    duration = time.perf_counter() - start
+    print(f"{label}: {count / duration:,.0f} previews/s ({duration * 1000 / count:.1f} ms each)")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else numFiles
+    with tempfile.TemporaryDirectory() as directory:
+        filepaths = [str(path) for path in make_corpus(Path(directory) / "corpus", count, size=imageSize) if path.suffix == ".jpg"]
+        count = len(filepaths)
+        cachePath = Path(directory) / "thumbnails"
+
+        measure("full decode", lambda: [full_decode(filepath) for filepath in filepaths], count)
+        measure("draft decode", lambda: [make_thumbnail(filepath) for filepath in filepaths], count)
+        measure("loader, cold disk cache", lambda: load_all(ThumbnailLoader(cachePath=cachePath), filepaths), count)
+        measure("loader, warm disk cache", lambda: load_all(ThumbnailLoader(cachePath=cachePath), filepaths), count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import os
+import random
+import sys
+from pathlib import Path
+
+from PIL import Image
+from PIL.TiffImagePlugin import IFDRational
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent)) # run from anywhere: python benchmarks/corpus.py
+
+from mapicture import supportedFormats  # noqa: E402
+
+# Synthetic photo corpus for the benchmarks: small images with controlled EXIF, reproducible for a given seed.
+# A share of the files has no EXIF at all, another share only uses a handful of timestamps (heavy collisions).
+
+tagDateTime = 306
+tagModel = 272
+tagGPSInfo = 34853
+
+formatShares = {".jpg": 0.7, ".tif": 0.1, ".png": 0.1, ".webp": 0.1} # webp/png EXIF depends on the Pillow build
+models = ["Canon EOS R5", "NIKON Z 6", "iPhone 13", "Pixel 7", None]
+
+
+def main():
+    # usage: python corpus.py [directory] [number of files]
+    directory = sys.argv[1] if len(sys.argv) > 1 else "corpus"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    paths = make_corpus(directory, count)
+    print(f"Created {len(paths)} files in {directory}")
+
+
+def get_formats() -> list:
+# formats of formatShares that PIL can open and save here, as (extension, share)
+    saveable = {extension for extension, format in Image.registered_extensions().items() if format in Image.SAVE}
+    return [(extension, share) for extension, share in formatShares.items() if extension in supportedFormats and extension in saveable]
+
+
+def make_exif(rng:random.Random, collisionShare:float, missingShare:float) -> Image.Exif:
+    exif = Image.Exif()
+    roll = rng.random()
+    if roll < missingShare:
+        return exif
+    if roll < missingShare + collisionShare: # a few timestamps shared by many files
+        exif[tagDateTime] = f"2023:07:14 10:00:{rng.randrange(5):02d}"
+    else:
+        exif[tagDateTime] = (f"{rng.randint(2015, 2024)}:{rng.randint(1, 12):02d}:{rng.randint(1, 28):02d} "
+                             f"{rng.randrange(24):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}")
+    model = rng.choice(models)
+    if model:
+        exif[tagModel] = model
+    if rng.random() < 0.3:
+        gps = exif.get_ifd(tagGPSInfo)
+        gps[1] = "N"
+        gps[2] = (IFDRational(rng.randrange(90), 1), IFDRational(rng.randrange(60), 1), IFDRational(rng.randrange(6000), 100))
+        gps[3] = "E"
+        gps[4] = (IFDRational(rng.randrange(180), 1), IFDRational(rng.randrange(60), 1), IFDRational(rng.randrange(6000), 100))
+    return exif
+
+
+def make_corpus(directory, count:int, seed:int = 0, collisionShare:float = 0.3, missingShare:float = 0.1, size:tuple = (32, 24)) -> list:
+# writes count images to directory (same seed, same corpus), returns their paths in creation order
+    rng = random.Random(seed)
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    extensions, shares = zip(*get_formats())
+
+    paths = []
+    for index in range(count):
+        extension = rng.choices(extensions, shares)[0]
+        filepath = directory / f"IMG_{index:06d}{extension}"
+        image = Image.new("RGB", size, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        image.save(filepath, exif=make_exif(rng, collisionShare, missingShare))
+        paths.append(filepath)
+    return paths
+
+
+def get_corpus_size(paths:list) -> int:
+    return sum(os.path.getsize(path) for path in paths)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import argparse
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent)) # run from anywhere: python benchmarks/run_benchmarks.py
+
+import utilities as util  # noqa: E402
+from corpus import get_corpus_size, make_corpus  # noqa: E402
+from fileinfo import get_date_time_data  # noqa: E402
+from mapicture import Photo, PhotoRegistry  # noqa: E402
+from renamer import RenameEngine, get_tag_dict_list, protectedTags  # noqa: E402
+
+# Times the hot paths separately on a synthetic corpus (see corpus.py) and writes the results as JSON.
+# With --baseline every benchmark is compared to an earlier result file, the run fails (exit code 1)
+# if any of them got slower by more than --threshold.
+# example: python benchmarks/run_benchmarks.py --output new.json --baseline baseline.json --threshold 0.2
+
+tags = ["YYYY-MM-DD", "hh-mm-ss", "####", "holiday"]
+
+
+def main(argv:list = None):
+    args = get_parser().parse_args(argv)
+    results = run_benchmarks(args.files, args.list_sizes, args.repeat, args.seed, args.max_widget_items)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+    else:
+        print(output)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            sys.exit(f"{len(regressions)} benchmarks regressed by more than {args.threshold:.0%}")
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark the SortMaPicture hot paths")
+    parser.add_argument("--files", type=int, default=2000, help="number of files in the synthetic corpus")
+    parser.add_argument("--list-sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="items added to the file lists")
+    parser.add_argument("--max-widget-items", type=int, default=10000,
+                        help="largest list size for File_Listbox, which creates widgets for every item")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, the fastest one counts")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic corpus")
+    parser.add_argument("--output", help="JSON file for the results (printed if not given)")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown per benchmark (0.2 = 20%%)")
+    return parser
+
+
+def measure(name:str, results:dict, count:int, function, setup=None, repeat:int = 3):
+# fastest of repeat runs, setup() runs before every run and isn't timed, its return value is passed to function
+    durations = []
+    for _ in range(repeat):
+        state = setup() if setup is not None else None
+        start = time.perf_counter()
+        function(state)
+        durations.append(time.perf_counter() - start)
+    seconds = min(durations)
+    results[name] = {"count": count, "seconds": seconds, "per_item": seconds / count if count else 0.0}
+    print(f"{name}: {count / seconds:,.0f} items/s ({seconds:.3f} s for {count})", file=sys.stderr)
+
+
+def skip(name:str, results:dict, reason:str):
+    results[name] = {"skipped": reason}
+    print(f"{name}: skipped ({reason})", file=sys.stderr)
+
+
+def run_benchmarks(numFiles:int, listSizes:list, repeat:int = 3, seed:int = 0, maxWidgetItems:int = 10000) -> dict:
+    results = dict()
+    with tempfile.TemporaryDirectory() as directory:
+        corpusDir = Path(directory) / "corpus"
+        paths = make_corpus(corpusDir, numFiles, seed)
+        corpusBytes = get_corpus_size(paths)
+        filepaths = [str(path) for path in paths]
+        tagDictList = get_tag_dict_list(tags)
+
+        measure("fileinfo.get_date_time_data", results, numFiles, lambda state: [get_date_time_data(path) for path in filepaths], repeat=repeat)
+        measure("Photo.__init__", results, numFiles, lambda state: [Photo(path) for path in filepaths], repeat=repeat)
+
+        # fresh registry every run, otherwise only the cache is measured
+        measure("RenameEngine.get_iterator_ids", results, numFiles, lambda engine: engine.get_iterator_ids(filepaths),
+                setup=lambda: RenameEngine(PhotoRegistry()), repeat=repeat)
+
+        engine = RenameEngine()
+        engine.get_iterator_ids(filepaths)
+        engine.tagDictList = engine.get_sized_tags(tagDictList)
+        photos = [engine.photoRegistry.get_photo(path) for path in filepaths]
+        for photo in photos:
+            photo.set_iterator_id(engine.iteratorIds[str(photo.get_path())])
+        measure("Photo.generate_name", results, numFiles, lambda state: [photo.generate_name(engine) for photo in photos], repeat=repeat)
+
+        # every file is renamed to the same name, so most renames need a duplicate suffix
+        def setup_rename():
+            renameDir = Path(directory) / "rename"
+            shutil.rmtree(renameDir, ignore_errors=True)
+            shutil.copytree(corpusDir, renameDir)
+            return [(renameDir / path.name, renameDir / ("photo" + path.suffix)) for path in paths], util.DirectoryNameIndex(renameDir)
+
+        def rename_all(state):
+            renames, nameIndex = state
+            for pathOld, pathNew in renames:
+                nameIndex.discard(pathOld.name)
+                util.rename_file(pathOld, pathNew, nameIndex)
+
+        measure("utilities.rename_file", results, numFiles, rename_all, setup=setup_rename, repeat=repeat)
+
+    run_list_benchmarks(results, listSizes, repeat, maxWidgetItems)
+    return {"benchmarks": results, "environment": get_environment(numFiles, corpusBytes)}
+
+
+def run_list_benchmarks(results:dict, listSizes:list, repeat:int, maxWidgetItems:int):
+# the file lists need a display (and Python 3.12+ to import main.py), skipped otherwise
+    try:
+        import main
+        root = main.ctk.CTk()
+    except Exception as error: # no display (TclError), old Python (SyntaxError), missing customtkinter
+        for size in listSizes:
+            skip(f"File_Listbox.add_item[{size}]", results, f"{type(error).__name__}: {error}")
+            skip(f"Virtual_File_Listbox.add_item[{size}]", results, f"{type(error).__name__}: {error}")
+        return
+
+    class ListApp: # the lists only need the protected tags of the App
+        _protectedTags = protectedTags
+    main.app = ListApp()
+
+    listboxes = [] # only the last list is kept alive
+    for size in listSizes:
+        items = [f"/photos/IMG_{index:06d}.jpg" for index in range(size)]
+        for listClass in (main.File_Listbox, main.Virtual_File_Listbox):
+            name = f"{listClass.__name__}.add_item[{size}]"
+            if listClass is main.File_Listbox and size > maxWidgetItems:
+                skip(name, results, f"more than {maxWidgetItems} items (--max-widget-items)")
+                continue
+
+            def new_listbox():
+                while listboxes:
+                    listboxes.pop().destroy()
+                listboxes.append(listClass(root))
+                listboxes[-1].grid(row=0, column=0, sticky="NSWE")
+                return listboxes[-1]
+
+            def add_all(listbox):
+                for item in items:
+                    listbox.add_item(item)
+                listbox.update() # includes the layout
+
+            measure(name, results, size, add_all, setup=new_listbox, repeat=repeat)
+    root.destroy()
+
+
+def get_environment(numFiles:int, corpusBytes:int) -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "files": numFiles,
+        "corpus_bytes": corpusBytes,
+    }
+
+
+def compare(results:dict, baseline:dict, threshold:float) -> list:
+# prints the change per benchmark, returns the names of the benchmarks slower than baseline * (1 + threshold)
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        before = baseline["benchmarks"].get(name)
+        if before is None or "per_item" not in before or "per_item" not in result:
+            continue
+        change = result["per_item"] / before["per_item"] - 1 if before["per_item"] else 0.0
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name}: {change:+.1%}" + (" REGRESSION" if regressed else ""), file=sys.stderr)
+    return regressions
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import argparse
+from itertools import chain
+from pathlib import Path
+
+import instrumentation
+from dedupe import duplicateModes
+from exifindex import ExifIndex
+from journal import RenameJournal
+from mapicture import PhotoRegistry
+from ordering import numberingScopes
+from renamer import RenameEngine, get_tag_dict_list
+from scanner import scan_directory
+from settings import Settings
+from template import DirectoryTemplate
+
+# Headless batch renaming, never imports customtkinter/Tk
+# example: python cli.py ~/Pictures/holiday --tags YYYY-MM-DD hhmmss "##" holiday --separator _
+
+
+def main(argv:list = None):
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    if args.stats:
+        instrumentation.enable(args.trace_memory)
+
+    journal = None if args.no_journal else RenameJournal(args.journal)
+    try:
+        if journal is not None:
+            for runId, result in journal.recover(args.recover):
+                print(f"Interrupted run {runId}: {result}")
+        if args.undo:
+            if journal is None:
+                parser.error("--undo needs the journal")
+            try:
+                runId, failed = journal.undo(None if args.undo == "last" else args.undo)
+            except ValueError as error:
+                parser.error(str(error))
+            print(f"Undid run {runId}" + (f", {len(failed)} files could not be restored" if failed else ""))
+            return
+        if args.directories or args.tags: # without them only the recovery runs
+            rename_directories(parser, args, journal)
+    finally:
+        if journal is not None:
+            journal.close()
+        if args.stats:
+            instrumentation.print_report(instrumentation.export(args.stats))
+
+
+def rename_directories(parser:argparse.ArgumentParser, args:argparse.Namespace, journal:RenameJournal):
+    if not args.directories or not args.tags:
+        parser.error("directories and --tags are required")
+
+    try:
+        tags = [set_iterator_width(tag, args.iterator_width) for tag in args.tags]
+        tagDictList = get_tag_dict_list(tags)
+        if args.folders:
+            DirectoryTemplate(args.folders) # only checks the template, the engine compiles it
+    except ValueError as error:
+        parser.error(str(error))
+
+    for directory in args.directories:
+        if not Path(directory).is_dir():
+            parser.error(f"{directory} is not a directory")
+    # files are scanned lazily while their metadata is read
+    filepaths = chain.from_iterable(
+        scan_directory(directory, args.recursive, args.max_depth, args.include, args.exclude) for directory in args.directories
+    )
+
+    index = ExifIndex(args.index) if args.index else None
+    engine = RenameEngine(PhotoRegistry(index=index), args.separator, journal, args.iterator_scope, not args.no_batch_table,
+                          args.duplicates, args.similar, args.folders, args.target)
+    try:
+        plan = engine.plan_renames(filepaths, tagDictList)
+        if args.dry_run:
+            plan.print_plan()
+            print(f"Would rename {len(plan)} files")
+        else:
+            renamed = engine.execute_plan(plan)
+            print(f"Renamed {len(renamed)} files")
+    finally:
+        if index is not None:
+            index.close()
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="sortmapicture", description="Rename photos by the date and time they were taken")
+    parser.add_argument("directories", nargs="*", help="directories containing the photos")
+    parser.add_argument("-r", "--recursive", action="store_true", help="include subdirectories")
+    parser.add_argument("--max-depth", type=int, default=None, help="maximum depth of subdirectories to include")
+    parser.add_argument("--include", action="append", help="only include files matching this glob (can be repeated)")
+    parser.add_argument("--exclude", action="append", help="skip files and directories matching this glob (can be repeated)")
+    parser.add_argument("-t", "--tags", nargs="+",
+                        help="tags in order of appearance: date tags use YYYY, MM and DD, time tags hh, mm and ss, "
+                             "iterator tags consist of '#', everything else is used as is")
+    parser.add_argument("-s", "--separator", default="_", choices=["", "-", "_"], help="separator between tags")
+    parser.add_argument("--iterator-width", type=int, default=None, help="minimum number of digits of the iterator")
+    parser.add_argument("--iterator-scope", choices=numberingScopes, default=Settings.iteratorScope,
+                        help="where iterator numbering restarts")
+    parser.add_argument("--index", default=Settings.exifIndexPath, help="SQLite metadata index to use (see exifindex.py)")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="only show the new names")
+    parser.add_argument("--undo", nargs="?", const="last", metavar="RUN_ID", help="revert the last (or the given) rename run and exit")
+    parser.add_argument("--recover", choices=["rollback", "replay"], default=Settings.journalRecovery,
+                        help="what to do with runs that were interrupted by a crash")
+    parser.add_argument("--journal", default=Settings.journalPath, help="journal file to use")
+    parser.add_argument("--stats", metavar="PATH", help="time every stage of the run and write the stats to this JSON file")
+    parser.add_argument("--trace-memory", action="store_true", help="also record the peak memory (with --stats)")
+    parser.add_argument("--no-journal", action="store_true", help="don't journal renames (no crash recovery or undo)")
+    parser.add_argument("--folders", default=Settings.folderTemplate, metavar="TEMPLATE",
+                        help="move the photos into folders like YYYY/MM-DD instead of renaming them in place")
+    parser.add_argument("--target", default=Settings.folderRoot,
+                        help="directory the folders of --folders are created in (default: the directory of each photo)")
+    parser.add_argument("--duplicates", choices=duplicateModes, default=Settings.duplicateMode,
+                        help="exact duplicate files: rename every copy (keep), list them (report) or only rename the first copy (skip)")
+    parser.add_argument("--similar", choices=duplicateModes, default=Settings.similarMode,
+                        help="near duplicates like burst shots: rename them all (keep), list them (report) or only rename the first (skip)")
+    parser.add_argument("--no-batch-table", action="store_true", help="order and name photo by photo instead of with NumPy (see batchtable.py)")
+    return parser
+
+
+def set_iterator_width(tag:str, width:int) -> str:
+    if width is not None and tag and set(tag) == {"#"}:
+        return "#" * width
+    return tag
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import hashlib
+import mmap
+import os
+import sys
+from collections import defaultdict, namedtuple
+
+import instrumentation
+from scanner import scan_directory, split_entry
+from settings import Settings
+
+# Exact duplicates in three stages, each stage only looks at the files the one before could not tell apart:
+# 1. file size (taken from the scan), 2. hash of the first and last sampleSize bytes, 3. hash of the whole file,
+# streamed through mmap. Most files already differ in size or sample and are never read completely.
+# Hashes are cached by (absolute path, size, mtime_ns), in memory and optionally in an ExifIndex (see exifindex.py).
+# usage: python dedupe.py <directory> [...] (prints the duplicates, nothing is changed)
+
+duplicateModes = ("keep", "report", "skip") # what RenameEngine does with duplicates (see Settings.duplicateMode)
+
+# original is the first of the identical files in the order they were given, duplicates are the others
+DuplicateGroup = namedtuple("DuplicateGroup", ["original", "duplicates"])
+
+chunkSize = 1 << 20 # bytes hashed per update while streaming a whole file
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: python dedupe.py <directory> [...]")
+        return
+    finder = DuplicateFinder()
+    entries = [entry for directory in sys.argv[1:] for entry in scan_directory(directory)]
+    groups = finder.find(entries)
+    for group in groups:
+        print(group.original)
+        for duplicate in group.duplicates:
+            print(f"  = {duplicate}")
+    print(f"{sum(len(group.duplicates) for group in groups)} duplicates of {len(groups)} files")
+
+
+class DuplicateFinder:
+    def __init__(self, sampleSize:int = Settings.dedupeSampleSize, index = None):
+        self.sampleSize = sampleSize
+        self.index = index # optional ExifIndex that keeps the hashes between sessions
+        self.errors = [] # (path, error) of the files that could not be read in the last search
+        self._hashes = dict() # (path, size, mtime_ns) -> [sample hash, full hash]
+
+    def find(self, entries) -> list:
+    # entries can be paths or ScanEntry items, returns a DuplicateGroup for every file that has exact copies
+        self.errors = []
+        bySize = defaultdict(list)
+        for position, item in enumerate(entries):
+            filepath, stat = split_entry(item)
+            try:
+                if stat is None:
+                    stat = os.stat(filepath)
+            except OSError as error:
+                self.errors.append((filepath, error))
+                continue
+            if stat.st_size: # empty files are not photos
+                bySize[stat.st_size].append((position, filepath, stat))
+
+        groups = []
+        with instrumentation.timer("dedupe.find"):
+            for size, files in bySize.items():
+                if len(files) < 2:
+                    continue
+                for candidates in self._split(files, self.get_sample_hash):
+                    if size <= 2 * self.sampleSize: # the sample already covered the whole file
+                        groups.append(candidates)
+                    else:
+                        groups.extend(self._split(candidates, self.get_full_hash))
+
+        groups.sort(key=lambda files: files[0][0]) # in the order of the entries
+        return [DuplicateGroup(files[0][1], [filepath for _, filepath, _ in files[1:]]) for files in groups]
+
+    def _split(self, files:list, get_hash) -> list:
+    # the groups of files (at least two) with the same hash, files keep their order within a group
+        byHash = defaultdict(list)
+        for file in files:
+            try:
+                byHash[get_hash(file[1], file[2])].append(file)
+            except (OSError, ValueError) as error: # ValueError: mmap of a file that was emptied since the scan
+                self.errors.append((file[1], error))
+        return [group for group in byHash.values() if len(group) > 1]
+
+    def get_sample_hash(self, filepath, stat:os.stat_result) -> str:
+        hashes = self._get_cached(filepath, stat)
+        if hashes[0] is None:
+            instrumentation.count("dedupe.sample_hash")
+            digest = hashlib.blake2b(digest_size=16)
+            with open(filepath, "rb") as file:
+                digest.update(file.read(self.sampleSize))
+                if stat.st_size > self.sampleSize:
+                    file.seek(max(stat.st_size - self.sampleSize, self.sampleSize))
+                    digest.update(file.read())
+            hashes[0] = digest.hexdigest()
+            self._store(filepath, stat, hashes)
+        return hashes[0]
+
+    def get_full_hash(self, filepath, stat:os.stat_result) -> str:
+        hashes = self._get_cached(filepath, stat)
+        if hashes[1] is None:
+            instrumentation.count("dedupe.full_hash")
+            digest = hashlib.blake2b(digest_size=32)
+            with open(filepath, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view: # pages are only read as they get hashed
+                    for offset in range(0, len(view), chunkSize):
+                        digest.update(view[offset:offset + chunkSize])
+            hashes[1] = digest.hexdigest()
+            self._store(filepath, stat, hashes)
+        return hashes[1]
+
+    def _get_cached(self, filepath, stat:os.stat_result) -> list:
+        key = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+        hashes = self._hashes.get(key)
+        if hashes is None:
+            stored = self.index.get_hashes(filepath, stat) if self.index is not None else None
+            hashes = self._hashes[key] = list(stored) if stored is not None else [None, None]
+        return hashes
+
+    def _store(self, filepath, stat:os.stat_result, hashes:list):
+        if self.index is not None:
+            self.index.put_hashes(filepath, stat, *hashes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+import instrumentation
+from fileinfo import DateTimeStrTpl, PhotoMetadata
+from settings import Settings
+
+
+def main():
+    # usage: python exifindex.py compact|count [index path]
+    command = sys.argv[1] if len(sys.argv) > 1 else "count"
+    indexPath = sys.argv[2] if len(sys.argv) > 2 else Settings.exifIndexPath
+    if not indexPath:
+        print("No index path given and Settings.exifIndexPath is not set")
+        return
+
+    with ExifIndex(indexPath) as index:
+        match command:
+            case "compact":
+                removed = index.compact()
+                print(f"Removed {removed} outdated entries, {len(index)} entries left")
+            case "count":
+                print(f"{len(index)} entries in {indexPath}")
+            case _:
+                print(f"Unknown command: {command}. Needs to be 'compact' or 'count'")
+
+
+class ExifIndex:
+# Persistent SQLite cache of the metadata Photo needs, keyed by (absolute path, size, mtime_ns).
+# Files with a matching entry don't need to be opened at all, only stat'ed.
+    _schema = """
+        CREATE TABLE IF NOT EXISTS metadata (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            year TEXT, month TEXT, day TEXT,
+            hour TEXT, minute TEXT, second TEXT,
+            model TEXT,
+            gps TEXT,
+            subsec TEXT
+        )
+    """
+    _upsert = """
+        INSERT INTO metadata (path, size, mtime_ns, year, month, day, hour, minute, second, model, gps, subsec)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(path) DO UPDATE SET
+            size=excluded.size, mtime_ns=excluded.mtime_ns,
+            year=excluded.year, month=excluded.month, day=excluded.day,
+            hour=excluded.hour, minute=excluded.minute, second=excluded.second,
+            model=excluded.model, gps=excluded.gps, subsec=excluded.subsec
+    """
+    # content hashes of dedupe.py, kept in their own table since most files are never hashed
+    _hashSchema = """
+        CREATE TABLE IF NOT EXISTS hashes (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            sample TEXT,
+            full TEXT
+        )
+    """
+    _hashUpsert = """
+        INSERT INTO hashes (path, size, mtime_ns, sample, full) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(path) DO UPDATE SET
+            size=excluded.size, mtime_ns=excluded.mtime_ns, sample=excluded.sample, full=excluded.full
+    """
+    _tables = ("metadata", "hashes")
+    # columns added after the first version, added to older index files on open (rows without them are read again)
+    _addedColumns = {"subsec": "TEXT"}
+
+    def __init__(self, indexPath, batchSize:int = Settings.exifIndexBatchSize):
+        self.indexPath = str(indexPath)
+        self.batchSize = batchSize
+        self._pendingRows = [] # rows waiting for the next bulk upsert
+        self._pendingHashRows = []
+        self._pendingRenames = []
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.indexPath, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.execute(self._schema)
+            self._connection.execute(self._hashSchema)
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(metadata)")}
+            for column, columnType in self._addedColumns.items():
+                if column not in columns:
+                    self._connection.execute(f"ALTER TABLE metadata ADD COLUMN {column} {columnType}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+
+    def get(self, filepath, stat:os.stat_result) -> PhotoMetadata:
+    # returns the stored metadata or None if the file is unknown or changed since it was indexed
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT year, month, day, hour, minute, second, model, gps, subsec FROM metadata WHERE path=? AND size=? AND mtime_ns=? AND subsec IS NOT NULL",
+                (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+        if row is None:
+            instrumentation.count("index.miss")
+            return None
+        instrumentation.count("index.hit")
+
+        YYYY, MM, DD, hh, mm, ss, model, gps, subSec = row
+        dateTimeStrTpl = DateTimeStrTpl(f"{YYYY}:{MM}:{DD}", f"{hh}:{mm}:{ss}", YYYY, MM, DD, hh, mm, ss)
+        gps = {int(tag): value for tag, value in json.loads(gps).items()} if gps else dict()
+        return PhotoMetadata(None, dateTimeStrTpl, stat, model, gps, subSec or "")
+
+    def put(self, filepath, metadata:PhotoMetadata):
+    # queues an entry, entries are written in bulk once batchSize is reached (or on flush/close)
+        dt = metadata.dateTimeStrTpl
+        row = (os.path.abspath(filepath), metadata.stat.st_size, metadata.stat.st_mtime_ns,
+               dt.YYYY, dt.MM, dt.DD, dt.hh, dt.mm, dt.ss,
+               metadata.model, json.dumps(metadata.gps, default=_to_json) if metadata.gps else None, metadata.subSec)
+        with self._lock:
+            self._pendingRows.append(row)
+            if len(self._pendingRows) >= self.batchSize:
+                self._flush()
+
+    def put_many(self, items):
+    # items: iterable of (filepath, metadata), written in a single transaction
+        for filepath, metadata in items:
+            self.put(filepath, metadata)
+        self.flush()
+
+    def get_hashes(self, filepath, stat:os.stat_result) -> tuple:
+    # (sample hash, full hash) stored for the file (either can be None), None if unknown or changed since
+        with self._lock:
+            return self._connection.execute(
+                "SELECT sample, full FROM hashes WHERE path=? AND size=? AND mtime_ns=?",
+                (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+
+    def put_hashes(self, filepath, stat:os.stat_result, sample:str, full:str):
+    # queued like put(), replaces the hashes stored for the file
+        row = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns, sample, full)
+        with self._lock:
+            self._pendingHashRows.append(row)
+            if len(self._pendingHashRows) >= self.batchSize:
+                self._flush()
+
+    def rename(self, pathOld, pathNew):
+    # keeps an entry valid after the file was renamed (renaming does not change size or mtime)
+        with self._lock:
+            self._pendingRenames.append((os.path.abspath(pathNew), os.path.abspath(pathOld)))
+            if len(self._pendingRenames) >= self.batchSize:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not (self._pendingRows or self._pendingHashRows or self._pendingRenames):
+            return
+        with self._connection: # one transaction per batch
+            self._connection.executemany(self._upsert, self._pendingRows)
+            self._connection.executemany(self._hashUpsert, self._pendingHashRows)
+            for new, old in self._pendingRenames: # one by one in the order they happened, so chains (A -> B, B -> C) move the right rows
+                for table in self._tables:
+                    self._connection.execute(f"DELETE FROM {table} WHERE path=?", (new,))
+                    self._connection.execute(f"UPDATE {table} SET path=? WHERE path=?", (new, old))
+        self._pendingRows.clear()
+        self._pendingHashRows.clear()
+        self._pendingRenames.clear()
+
+    def compact(self) -> int:
+    # removes entries for files that no longer exist or changed on disk, returns the number of removed entries
+        self.flush()
+        with self._lock:
+            removed = 0
+            for table in self._tables:
+                outdated = []
+                for path, size, mtime_ns in self._connection.execute(f"SELECT path, size, mtime_ns FROM {table}"):
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        outdated.append((path,))
+                        continue
+                    if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                        outdated.append((path,))
+
+                with self._connection:
+                    self._connection.executemany(f"DELETE FROM {table} WHERE path=?", outdated)
+                removed += len(outdated)
+            self._connection.execute("VACUUM")
+        return removed
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+
+def _to_json(value):
+# GPS values contain PIL rationals and bytes that json can't handle by itself
+    if isinstance(value, bytes):
+        return value.hex()
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+if __name__ == "__main__":
+    main()
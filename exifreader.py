@@ -0,0 +1,195 @@
+import mmap
+import struct
+
+from utilities import get_filepath
+
+# Lightweight EXIF reader for JPEG and TIFF files.
+# Walks IFD0, the Exif IFD and the GPS IFD once and only decodes the requested tags, instead of letting PIL build a full Image object.
+# Sub IFD entries are merged into the top level dict, except GPS, which is kept as a nested dict of all its entries.
+# Returns a plain {tag: value} dict (like PIL's Exif mapping), or None for formats it doesn't understand.
+# read_thumbnail returns the JPEG preview most cameras store in IFD1.
+
+tagOrientation = 274
+tagThumbnailOffset = 513 # JPEGInterchangeFormat (IFD1)
+tagThumbnailLength = 514 # JPEGInterchangeFormatLength (IFD1)
+tagDateTime = 306
+tagModel = 272
+tagExifIFD = 34665
+tagGPSInfo = 34853
+tagDateTimeOriginal = 36867
+tagSubSecTime = 37520
+tagSubSecTimeOriginal = 37521
+
+defaultTags = frozenset({tagDateTime, tagModel, tagGPSInfo, tagDateTimeOriginal, tagSubSecTime, tagSubSecTimeOriginal})
+
+# TIFF field type -> (size in bytes, struct format character)
+fieldTypes = {
+    1: (1, "B"), # BYTE
+    2: (1, "s"), # ASCII
+    3: (2, "H"), # SHORT
+    4: (4, "L"), # LONG
+    5: (8, "LL"), # RATIONAL
+    7: (1, "s"), # UNDEFINED
+    9: (4, "l"), # SLONG
+    10: (8, "ll") # SRATIONAL
+}
+
+jpegSOI = b"\xff\xd8"
+exifHeader = b"Exif\x00\x00"
+tiffHeaders = (b"II*\x00", b"MM\x00*")
+
+
+def main():
+    filepath = get_filepath()
+    print(read_exif(filepath))
+
+
+def read_exif(filepath, tags:frozenset = defaultTags) -> dict:
+# tags: IDs to read from any of the IFDs, tags=None reads everything
+    with open(filepath, "rb") as file:
+        try:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError: # empty file
+            return None
+        with data:
+            try:
+                if data[:2] == jpegSOI:
+                    tiffOffset = find_jpeg_exif(data)
+                    if tiffOffset is None:
+                        return dict() # valid JPEG without EXIF data
+                elif data[:4] in tiffHeaders:
+                    tiffOffset = 0
+                else:
+                    return None
+                return read_tiff_structure(data, tiffOffset, tags)
+            except (struct.error, IndexError, ValueError): # malformed header, let PIL deal with it
+                return None
+
+
+def read_thumbnail(filepath) -> bytes:
+# the embedded JPEG thumbnail of a JPEG file, None if it has none (or isn't a JPEG)
+    with open(filepath, "rb") as file:
+        try:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError: # empty file
+            return None
+        with data:
+            try:
+                if data[:2] != jpegSOI:
+                    return None
+                base = find_jpeg_exif(data)
+                if base is None:
+                    return None
+                endian = get_endian(data, base)
+                ifd0Offset = struct.unpack_from(endian + "L", data, base + 4)[0]
+                ifd1Offset = get_next_ifd_offset(data, base, ifd0Offset, endian)
+                if not ifd1Offset:
+                    return None
+                ifd1 = read_ifd(data, base, ifd1Offset, endian, {tagThumbnailOffset, tagThumbnailLength})
+                if tagThumbnailOffset not in ifd1 or not ifd1.get(tagThumbnailLength):
+                    return None
+                start = base + ifd1[tagThumbnailOffset]
+                thumbnail = data[start:start + ifd1[tagThumbnailLength]]
+                return thumbnail if thumbnail[:2] == jpegSOI else None
+            except (struct.error, IndexError, ValueError):
+                return None
+
+
+def find_jpeg_exif(data) -> int:
+# walks the JPEG marker segments up to the image data and returns the offset of the TIFF header inside APP1
+    position = 2
+    while position + 4 <= len(data):
+        if data[position] != 0xFF:
+            raise ValueError("Invalid JPEG marker")
+        marker = data[position + 1]
+        if marker == 0xFF: # padding
+            position += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7: # markers without a length field
+            position += 2
+            continue
+        if marker in (0xD9, 0xDA): # end of image / start of scan, no EXIF before the image data
+            return None
+
+        length = struct.unpack_from(">H", data, position + 2)[0]
+        segmentStart = position + 4
+        if marker == 0xE1 and data[segmentStart:segmentStart + 6] == exifHeader:
+            return segmentStart + 6
+        position = segmentStart + length - 2
+    return None
+
+
+def get_endian(data, base:int) -> str:
+# struct byte order of the TIFF header at base
+    byteOrder = data[base:base + 2]
+    if byteOrder == b"II":
+        return "<"
+    if byteOrder == b"MM":
+        return ">"
+    raise ValueError("Invalid TIFF header")
+
+
+def read_tiff_structure(data, base:int, tags:frozenset = defaultTags) -> dict:
+    endian = get_endian(data, base)
+    ifd0Offset = struct.unpack_from(endian + "L", data, base + 4)[0]
+    pointers = {tagExifIFD, tagGPSInfo}
+    exif = read_ifd(data, base, ifd0Offset, endian, None if tags is None else tags | pointers)
+
+    # follow the pointers to the sub IFDs
+    exifIFDOffset = exif.pop(tagExifIFD, None)
+    if exifIFDOffset is not None:
+        exif.update(read_ifd(data, base, exifIFDOffset, endian, tags))
+
+    gpsOffset = exif.pop(tagGPSInfo, None)
+    if gpsOffset is not None and (tags is None or tagGPSInfo in tags):
+        exif[tagGPSInfo] = read_ifd(data, base, gpsOffset, endian, None)
+
+    return exif
+
+
+def read_ifd(data, base:int, offset:int, endian:str, tags:set) -> dict:
+# reads the entries of a single IFD, tags=None reads all of them
+    output = dict()
+    position = base + offset
+    entryCount = struct.unpack_from(endian + "H", data, position)[0]
+    position += 2
+    for _ in range(entryCount):
+        tag, fieldType, count, valueOffset = struct.unpack_from(endian + "HHL4s", data, position)
+        position += 12
+        if (tags is not None and tag not in tags) or fieldType not in fieldTypes:
+            continue
+
+        size = fieldTypes[fieldType][0]
+        if size * count <= 4:
+            valueStart = position - 4 # value is stored directly in the entry
+        else:
+            valueStart = base + struct.unpack(endian + "L", valueOffset)[0]
+        output[tag] = read_value(data, valueStart, fieldType, count, endian)
+    return output
+
+
+def get_next_ifd_offset(data, base:int, offset:int, endian:str) -> int:
+# the offset stored after the entries of an IFD, 0 for the last IFD
+    entryCount = struct.unpack_from(endian + "H", data, base + offset)[0]
+    return struct.unpack_from(endian + "L", data, base + offset + 2 + 12 * entryCount)[0]
+
+
+def read_value(data, start:int, fieldType:int, count:int, endian:str):
+    size, formatChar = fieldTypes[fieldType]
+    raw = data[start:start + size * count]
+    if len(raw) < size * count:
+        raise ValueError("Value outside of file")
+
+    if fieldType == 2: # ASCII
+        return raw.split(b"\x00", 1)[0].decode("ascii", errors="replace").strip()
+    if fieldType == 7: # UNDEFINED
+        return bytes(raw)
+
+    values = struct.unpack(endian + formatChar * count, raw)
+    if fieldType in (5, 10): # rationals are stored as numerator/denominator pairs
+        values = tuple(num / den if den else 0.0 for num, den in zip(values[::2], values[1::2]))
+    return values[0] if count == 1 else values
+
+
+if __name__ == "__main__":
+    main()
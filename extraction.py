@@ -0,0 +1,82 @@
+import os
+from collections import deque, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from fileinfo import get_photo_metadata
+from mapicture import PhotoRegistry
+from scanner import split_entry
+from settings import Settings
+
+# photo is None if the file couldn't be read, error holds the reason
+ExtractionResult = namedtuple("ExtractionResult", ["path", "photo", "error"])
+
+
+def extract_photos(filepaths, registry:PhotoRegistry, workers:int = Settings.extractionWorkers,
+                   executor:str = Settings.extractionExecutor, window:int = Settings.extractionWindow):
+# Yields an ExtractionResult for every filepath, in the order of filepaths.
+# filepaths can also contain ScanEntry items (see scanner.py), their stat data is reused.
+# Metadata is read by a pool of workers, with at most 'window' files in flight at the same time.
+    if workers <= 1:
+        for item in filepaths:
+            yield _get_result(registry, item)
+        return
+
+    match executor:
+        case "thread":
+            pool = ThreadPoolExecutor(max_workers=workers)
+            submit = lambda item: pool.submit(_get_result, registry, item)  # noqa: E731
+        case "process":
+            from concurrent.futures import ProcessPoolExecutor # pulls in multiprocessing, only when needed
+            pool = ProcessPoolExecutor(max_workers=workers)
+            submit = lambda item: _submit_to_process(pool, registry, item)  # noqa: E731
+        case _:
+            raise ValueError(f"Invalid executor: {executor}. Needs to be 'thread' or 'process'")
+
+    inFlight = deque() # futures in the same order as filepaths
+    with pool:
+        for item in filepaths:
+            inFlight.append(submit(item))
+            if len(inFlight) >= window:
+                yield inFlight.popleft().result()
+        while inFlight:
+            yield inFlight.popleft().result()
+
+
+def _get_result(registry:PhotoRegistry, item) -> ExtractionResult:
+    filepath, stat = split_entry(item)
+    try:
+        return ExtractionResult(filepath, registry.get_photo(filepath, stat), None)
+    except Exception as error: # one unreadable file must not stop the whole batch
+        return ExtractionResult(filepath, None, error)
+
+
+def _submit_to_process(pool:"ProcessPoolExecutor", registry:PhotoRegistry, item) -> Future:
+# cached files are resolved right away, only the others are sent to a worker process
+    output = Future()
+    filepath, stat = split_entry(item)
+    try:
+        if stat is None:
+            stat = os.stat(filepath)
+        photo = registry.get_cached(filepath, stat)
+    except Exception:
+        output.set_result(_get_result(registry, item)) # let the registry report the error
+        return output
+
+    if photo is not None:
+        output.set_result(ExtractionResult(filepath, photo, None))
+        return output
+
+    def _done(future:Future):
+        try:
+            photo = registry.add_photo(filepath, stat, future.result())
+            output.set_result(ExtractionResult(filepath, photo, None))
+        except Exception as error:
+            output.set_result(ExtractionResult(filepath, None, error))
+
+    pool.submit(_read_metadata, filepath, stat).add_done_callback(_done)
+    return output
+
+
+def _read_metadata(filepath, stat:os.stat_result):
+# runs in a worker process, the raw EXIF data isn't needed by Photo, so it isn't sent back
+    return get_photo_metadata(filepath, stat)._replace(exif=None)
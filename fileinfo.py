@@ -3,8 +3,9 @@ from collections import namedtuple
 from datetime import datetime
 from pathlib import Path
 
-from PIL import ExifTags, Image
-
+import exifreader
+import formats
+import instrumentation
 from utilities import get_filepath
 
 testPath = r"C:\Users\majoc\Coding\GitHub\SortMaPicture\src\test_photos\IMG_0.JPG"
@@ -15,6 +16,39 @@ supportedTags = {
     "GPSInfo": 34853
 }
 
+# name -> ID of every tag SortMaPicture reads, other names are looked up in PIL's table (see get_exif_tag_id_from_str)
+tagIDs = {
+    "DateTime": 306,
+    "Model": 272,
+    "ExifOffset": 34665,
+    "GPSInfo": 34853,
+    "DateTimeOriginal": 36867,
+    "SubsecTime": 37520,
+    "SubsecTimeOriginal": 37521,
+}
+
+exifIFDTag = tagIDs["ExifOffset"]
+
+# ExifRecord field -> tag, a new field only needs an entry here (the file is still walked once)
+recordTags = {
+    "dateTime": "DateTime", # str or None
+    "dateTimeOriginal": "DateTimeOriginal", # str or None
+    "model": "Model", # str or None
+    "gps": "GPSInfo", # dict, empty without GPS data
+    "subSecOriginal": "SubsecTimeOriginal", # str or None
+    "subSec": "SubsecTime", # str or None
+}
+ExifRecord = namedtuple("ExifRecord", list(recordTags))
+recordTagIDs = tuple(tagIDs[name] for name in recordTags.values())
+readerTags = frozenset(recordTagIDs) # what exifreader has to decode
+
+_allTagIDs = None # PIL's complete name -> ID table, built on first use
+
+DateTimeStrTpl = namedtuple("DateTimeStrTpl", ["date", "time", "YYYY", "MM", "DD", "hh", "mm", "ss"])
+
+# everything Photo needs from a file, gathered with a single open
+PhotoMetadata = namedtuple("PhotoMetadata", ["exif", "dateTimeStrTpl", "stat", "model", "gps", "subSec"])
+
 
 def main():
     filepath = get_filepath()
@@ -25,6 +59,8 @@ def main():
     
 
 def get_all_data(filepath):
+    from PIL import ExifTags, Image
+
     if os.path.exists(filepath):
         img = Image.open(filepath)
         exif = img.getexif()
@@ -38,26 +74,33 @@ def get_all_data(filepath):
     else:
         print(f"Filepath: {filepath} doesn't exist")
 
-def get_date_time_data(filepath:str):
-    with Image.open(filepath) as img:
-        exif = img.getexif()
-    
-
-
-    exifTagID = get_exif_tag_id_from_str("DateTime")
-    
-    exifDateTime = get_exif_data(exif, exifTagID)
-
-    DateTimeStrTpl = namedtuple("DateTimeStrTpl", ["date", "time", "YYYY", "MM", "DD", "hh", "mm", "ss"])
-
-    if exifDateTime: #check if Date taken is in exiff data
-        exifDate, exifTime = exifDateTime.split()
-        YYYY,MM,DD = exifDate.split(":")
-        hh,mm,ss = exifTime.split(":")
-        output = DateTimeStrTpl(exifDate, exifTime, YYYY, MM, DD, hh, mm, ss)
-    else: # if not take "file created" data
-        path = Path(filepath)
-        sysCreationTime = path.stat().st_birthtime # time in seconds
+@instrumentation.timed("metadata.read")
+def get_photo_metadata(filepath:str, stat:os.stat_result=None) -> PhotoMetadata:
+# opens the file exactly once and returns exif, date/time and stat data together
+# (the ExifIndex is checked before that by PhotoRegistry.get_cached)
+    if stat is None:
+        with instrumentation.timer("metadata.stat"):
+            stat = os.stat(filepath)
+
+    exif = get_exif(filepath)
+    record = get_exif_record(exif)
+    dateTimeStrTpl = get_date_time_data(filepath, exif, stat, record)
+    return PhotoMetadata(exif, dateTimeStrTpl, stat, record.model, record.gps, get_sub_sec_data(exif, record))
+
+def get_date_time_data(filepath:str, exif=None, stat:os.stat_result=None, record:ExifRecord=None):
+# exif, stat and record can be passed in if they were already read, otherwise the file is opened here
+    if record is None:
+        if exif is None:
+            exif = get_exif(filepath)
+        record = get_exif_record(exif)
+
+    output = parse_exif_date_time(record.dateTime) if record.dateTime else None
+
+    if output is None: # no (valid) date taken in the exif data, take "file created" data
+        instrumentation.count("timestamp.fallback")
+        if stat is None:
+            stat = Path(filepath).stat()
+        sysCreationTime = getattr(stat, "st_birthtime", None) or stat.st_mtime # time in seconds, st_birthtime is not available on every platform
         sysDateTime = datetime.fromtimestamp(sysCreationTime)
         YYYY = str(sysDateTime.year)
         MM = str(sysDateTime.month).zfill(2) # make sure it's always a 2 character string
@@ -70,21 +113,72 @@ def get_date_time_data(filepath:str):
     return output
     
 
+def parse_exif_date_time(exifDateTime:str) -> DateTimeStrTpl:
+# None for values that aren't a real date (e.g. "0000:00:00 00:00:00" of cameras without a set clock)
+    try:
+        exifDate, exifTime = exifDateTime.split()
+        YYYY,MM,DD = exifDate.split(":")
+        hh,mm,ss = exifTime.split(":")
+        datetime(int(YYYY), int(MM), int(DD), int(hh), int(mm), int(ss))
+    except (ValueError, AttributeError):
+        return None
+    return DateTimeStrTpl(exifDate, exifTime, YYYY, MM, DD, hh, mm, ss)
+
+def get_exif(filepath:str):
+# reads JPEG/TIFF headers directly, only other formats need a PIL Image object
+    with instrumentation.timer("exif.reader"):
+        exif = exifreader.read_exif(filepath, readerTags)
+    if exif is None:
+        instrumentation.count("exif.pil_fallback")
+        with instrumentation.timer("exif.pil_open"):
+            img = formats.open_image(filepath) # only loads the PIL plugin of this format
+        with img, instrumentation.timer("exif.pil_decode"):
+            exif = img.getexif()
+    return exif
+
+def get_exif_record(exif) -> ExifRecord:
+# all record tags from either exifreader's dict or PIL's Exif object, one lookup per tag
+    if hasattr(exif, "get_ifd"): # PIL keeps the Exif and GPS IFDs separate
+        exifIFD = exif.get_ifd(exifIFDTag)
+        gps = dict(exif.get_ifd(tagIDs["GPSInfo"]))
+        values = [exif.get(tag, exifIFD.get(tag)) for tag in recordTagIDs]
+    else:
+        gps = exif.get(tagIDs["GPSInfo"]) or dict()
+        values = [exif.get(tag) for tag in recordTagIDs]
+    return ExifRecord._make(values)._replace(gps=gps)
+
 def get_exif_tag_id_from_str(tag_str:str):
-    for tag_id in ExifTags.TAGS:
-        #print(f"TagID: {tag_id} - TagVal: {ExifTags.TAGS[tag_id]} - TagStr: {tag_str}")
-        if ExifTags.TAGS[tag_id] == tag_str:
-            return tag_id
+    if tag_str in tagIDs:
+        return tagIDs[tag_str]
+    return get_all_tag_ids().get(tag_str)
+
+def get_all_tag_ids() -> dict:
+    global _allTagIDs
+    if _allTagIDs is None:
+        from PIL import ExifTags # deferred, keeps PIL out of the startup path
+        _allTagIDs = {name: tag for tag, name in ExifTags.TAGS.items()}
+    return _allTagIDs
 
 def get_exif_data(exif, tag:int) -> str:
-    try: 
-        _ = ExifTags.TAGS[tag]
-    except:  # noqa: E722
-        raise ValueError(f"{tag} is not a valid ID for an ExifTag")
-    
-    for _tag, value in exif.items():
-        if tag == _tag:
+    if tag not in recordTagIDs:
+        from PIL import ExifTags
+
+        if tag not in ExifTags.TAGS:
+            raise ValueError(f"{tag} is not a valid ID for an ExifTag")
+    return exif.get(tag)
+
+def get_gps_data(exif) -> dict:
+    return get_exif_record(exif).gps
+
+def get_sub_sec_data(exif, record:ExifRecord = None) -> str:
+# fraction of a second as a string of digits (e.g. "25" = 0.25 s), empty if unknown
+    if record is None:
+        record = get_exif_record(exif)
+    for value in (record.subSecOriginal, record.subSec):
+        value = str(value or "").strip()
+        if value.isdigit():
             return value
+    return ""
 
 
 
@@ -0,0 +1,127 @@
+import importlib
+import threading
+from pathlib import Path
+
+# Image formats without touching PIL at startup: the extension table below is what
+# Image.registered_extensions() returns once PIL has initialized every plugin (Pillow 12),
+# a plugin is only imported when the first file of its format is opened.
+# python formats.py compares the table with the installed Pillow.
+
+# extension -> (PIL format, plugin module in the PIL package)
+extensionTable = {
+    ".apng": ("PNG", "PngImagePlugin"),
+    ".avif": ("AVIF", "AvifImagePlugin"),
+    ".avifs": ("AVIF", "AvifImagePlugin"),
+    ".blp": ("BLP", "BlpImagePlugin"),
+    ".bmp": ("BMP", "BmpImagePlugin"),
+    ".bufr": ("BUFR", "BufrStubImagePlugin"),
+    ".bw": ("SGI", "SgiImagePlugin"),
+    ".cur": ("CUR", "CurImagePlugin"),
+    ".dcx": ("DCX", "DcxImagePlugin"),
+    ".dds": ("DDS", "DdsImagePlugin"),
+    ".dib": ("DIB", "BmpImagePlugin"),
+    ".emf": ("WMF", "WmfImagePlugin"),
+    ".eps": ("EPS", "EpsImagePlugin"),
+    ".fit": ("FITS", "FitsImagePlugin"),
+    ".fits": ("FITS", "FitsImagePlugin"),
+    ".flc": ("FLI", "FliImagePlugin"),
+    ".fli": ("FLI", "FliImagePlugin"),
+    ".ftc": ("FTEX", "FtexImagePlugin"),
+    ".ftu": ("FTEX", "FtexImagePlugin"),
+    ".gbr": ("GBR", "GbrImagePlugin"),
+    ".gif": ("GIF", "GifImagePlugin"),
+    ".grib": ("GRIB", "GribStubImagePlugin"),
+    ".h5": ("HDF5", "Hdf5StubImagePlugin"),
+    ".hdf": ("HDF5", "Hdf5StubImagePlugin"),
+    ".icb": ("TGA", "TgaImagePlugin"),
+    ".icns": ("ICNS", "IcnsImagePlugin"),
+    ".ico": ("ICO", "IcoImagePlugin"),
+    ".iim": ("IPTC", "IptcImagePlugin"),
+    ".im": ("IM", "ImImagePlugin"),
+    ".j2c": ("JPEG2000", "Jpeg2KImagePlugin"),
+    ".j2k": ("JPEG2000", "Jpeg2KImagePlugin"),
+    ".jfif": ("JPEG", "JpegImagePlugin"),
+    ".jp2": ("JPEG2000", "Jpeg2KImagePlugin"),
+    ".jpc": ("JPEG2000", "Jpeg2KImagePlugin"),
+    ".jpe": ("JPEG", "JpegImagePlugin"),
+    ".jpeg": ("JPEG", "JpegImagePlugin"),
+    ".jpf": ("JPEG2000", "Jpeg2KImagePlugin"),
+    ".jpg": ("JPEG", "JpegImagePlugin"),
+    ".jpx": ("JPEG2000", "Jpeg2KImagePlugin"),
+    ".mpeg": ("MPEG", "MpegImagePlugin"),
+    ".mpg": ("MPEG", "MpegImagePlugin"),
+    ".msp": ("MSP", "MspImagePlugin"),
+    ".pbm": ("PPM", "PpmImagePlugin"),
+    ".pcd": ("PCD", "PcdImagePlugin"),
+    ".pcx": ("PCX", "PcxImagePlugin"),
+    ".pfm": ("PPM", "PpmImagePlugin"),
+    ".pgm": ("PPM", "PpmImagePlugin"),
+    ".png": ("PNG", "PngImagePlugin"),
+    ".pnm": ("PPM", "PpmImagePlugin"),
+    ".ppm": ("PPM", "PpmImagePlugin"),
+    ".ps": ("EPS", "EpsImagePlugin"),
+    ".psd": ("PSD", "PsdImagePlugin"),
+    ".pxr": ("PIXAR", "PixarImagePlugin"),
+    ".qoi": ("QOI", "QoiImagePlugin"),
+    ".ras": ("SUN", "SunImagePlugin"),
+    ".rgb": ("SGI", "SgiImagePlugin"),
+    ".rgba": ("SGI", "SgiImagePlugin"),
+    ".sgi": ("SGI", "SgiImagePlugin"),
+    ".tga": ("TGA", "TgaImagePlugin"),
+    ".tif": ("TIFF", "TiffImagePlugin"),
+    ".tiff": ("TIFF", "TiffImagePlugin"),
+    ".vda": ("TGA", "TgaImagePlugin"),
+    ".vst": ("TGA", "TgaImagePlugin"),
+    ".webp": ("WEBP", "WebPImagePlugin"),
+    ".wmf": ("WMF", "WmfImagePlugin"),
+    ".xbm": ("XBM", "XbmImagePlugin"),
+    ".xpm": ("XPM", "XpmImagePlugin"),
+}
+
+supportedFormats = frozenset(extensionTable)
+
+_loadedPlugins = set()
+_lock = threading.Lock()
+
+
+def main():
+    from utilities import get_PIL_supported_formats # initializes every plugin
+
+    installed = get_PIL_supported_formats()
+    missing = sorted(installed - supportedFormats)
+    unavailable = sorted(supportedFormats - installed)
+    print(f"Extensions known to the installed Pillow, but missing in the table: {', '.join(missing) or 'none'}")
+    print(f"Extensions in the table the installed Pillow can't open: {', '.join(unavailable) or 'none'}")
+
+
+def is_supported(filepath) -> bool:
+    return Path(filepath).suffix.lower() in supportedFormats
+
+
+def load_plugin(filepath) -> str:
+# imports the PIL plugin for the extension of filepath (once), returns the PIL format name
+    extension = Path(filepath).suffix.lower()
+    if extension not in extensionTable:
+        raise ValueError(f"Unsupported image format: {extension}")
+    formatName, plugin = extensionTable[extension]
+    if plugin not in _loadedPlugins:
+        with _lock:
+            importlib.import_module(f"PIL.{plugin}") # registers the format with PIL.Image
+            _loadedPlugins.add(plugin)
+    return formatName
+
+
+def open_image(filepath):
+# Image.open that only tries the plugin matching the extension, all plugins are only loaded
+# if the file turns out to be in another format than its extension says
+    from PIL import Image, UnidentifiedImageError
+
+    formatName = load_plugin(filepath)
+    try:
+        return Image.open(filepath, formats=[formatName])
+    except UnidentifiedImageError:
+        return Image.open(filepath)
+
+
+if __name__ == "__main__":
+    main()
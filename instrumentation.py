@@ -0,0 +1,186 @@
+import functools
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+from pathlib import Path
+
+from settings import Settings
+
+# Counts and times the stages of a rename run (metadata reading, name generation, renaming, ...).
+# Disabled by default: timer() then returns a shared no-op context and count() returns right away,
+# so the instrumented code only pays for one function call and one flag check.
+# Stats of worker processes (extractionExecutor = "process") are not collected.
+# usage: python instrumentation.py [stats file] (prints a saved report as a table)
+
+enabled = False
+
+_noTimer = nullcontext()
+_lock = threading.Lock()
+_stages = dict() # stage -> dict(count, total, min, max, buckets)
+_counters = dict() # name -> int
+_started = time.perf_counter()
+_tracingMemory = False # True if tracemalloc was started here
+
+
+def main():
+    statsPath = sys.argv[1] if len(sys.argv) > 1 else Settings.statsPath
+    if statsPath is None:
+        print("usage: python instrumentation.py <stats file>")
+        return
+    print_report(json.loads(Path(statsPath).read_text(encoding="utf-8")))
+
+
+def enable(traceMemory:bool = Settings.traceMemory):
+# also measures the peak memory of the run with traceMemory (slows down allocations noticeably)
+    global enabled, _tracingMemory
+    enabled = True
+    if traceMemory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _tracingMemory = True
+    reset()
+
+
+def disable():
+    global enabled, _tracingMemory
+    enabled = False
+    if _tracingMemory:
+        tracemalloc.stop()
+        _tracingMemory = False
+
+
+def reset():
+# starts a new report, call at the beginning of every run
+    global _started
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _started = time.perf_counter()
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+
+# Recording
+
+class StageTimer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage:str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        add_time(self.stage, time.perf_counter() - self.start)
+
+
+def timer(stage:str):
+    # with instrumentation.timer("exif.reader"): ...
+    if not enabled:
+        return _noTimer
+    return StageTimer(stage)
+
+
+def timed(stage:str):
+# decorator version of timer(), for functions that are a stage as a whole
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with StageTimer(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name:str, amount:int = 1):
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def add_time(stage:str, seconds:float):
+    bucket = int(seconds * 1000000).bit_length() # histogram bucket i holds durations below 2**i microseconds
+    with _lock:
+        stats = _stages.get(stage)
+        if stats is None:
+            stats = _stages[stage] = {"count": 0, "total": 0.0, "min": seconds, "max": seconds, "buckets": dict()}
+        stats["count"] += 1
+        stats["total"] += seconds
+        stats["min"] = min(stats["min"], seconds)
+        stats["max"] = max(stats["max"], seconds)
+        stats["buckets"][bucket] = stats["buckets"].get(bucket, 0) + 1
+
+
+# Reporting
+
+def get_percentile(buckets:dict, count:int, percentile:float) -> int:
+# upper bound (microseconds) of the bucket that holds the percentile
+    rank = percentile * count
+    seen = 0
+    for bucket in sorted(buckets):
+        seen += buckets[bucket]
+        if seen >= rank:
+            return 2 ** bucket
+    return 2 ** max(buckets)
+
+
+def report() -> dict:
+    with _lock:
+        stages = {stage: dict(stats, buckets=dict(stats["buckets"])) for stage, stats in _stages.items()}
+        counters = dict(_counters)
+        duration = time.perf_counter() - _started
+
+    output = {"duration_s": duration, "stages": dict(), "counters": counters}
+    for stage, stats in sorted(stages.items()):
+        output["stages"][stage] = {
+            "count": stats["count"],
+            "total_s": stats["total"],
+            "mean_us": stats["total"] / stats["count"] * 1000000,
+            "min_us": stats["min"] * 1000000,
+            "max_us": stats["max"] * 1000000,
+            "p50_us": get_percentile(stats["buckets"], stats["count"], 0.5),
+            "p90_us": get_percentile(stats["buckets"], stats["count"], 0.9),
+            "p99_us": get_percentile(stats["buckets"], stats["count"], 0.99),
+            "histogram_us": {f"<{2 ** bucket}": number for bucket, number in sorted(stats["buckets"].items())},
+        }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        output["memory"] = {"current_bytes": current, "peak_bytes": peak}
+    return output
+
+
+def export(statsPath = Settings.statsPath) -> dict:
+# writes the report of the current run as JSON, nothing happens while disabled or without a path
+    if not enabled or statsPath is None:
+        return None
+    output = report()
+    statsPath = Path(statsPath)
+    statsPath.parent.mkdir(parents=True, exist_ok=True)
+    statsPath.write_text(json.dumps(output, indent=2), encoding="utf-8")
+    return output
+
+
+def print_report(output:dict):
+    print(f"Run took {output['duration_s']:.3f} s")
+    for stage, stats in output["stages"].items():
+        print(f"{stage}: {stats['count']} x {stats['mean_us']:.0f} us = {stats['total_s']:.3f} s "
+              f"(p50 < {stats['p50_us']} us, p99 < {stats['p99_us']} us)")
+    for name, number in output["counters"].items():
+        print(f"{name}: {number}")
+    if "memory" in output:
+        print(f"Peak memory: {output['memory']['peak_bytes'] / 1048576:.1f} MiB")
+
+
+if Settings.instrumentation:
+    enable(Settings.traceMemory)
+
+
+if __name__ == "__main__":
+    main()
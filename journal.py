@@ -0,0 +1,241 @@
+import json
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import instrumentation
+from settings import Settings
+from utilities import rename_no_replace
+
+# Write-ahead journal of rename runs (one JSON object per line).
+# The planned steps of a run are made durable before the first rename, completed steps are
+# group-committed (one fsync per batch), so an interrupted run can be replayed or rolled back.
+# Once no run is open anymore the journal is rotated (journal.1, journal.2, ...), so starting up only reads
+# runs that might need recovery, the last historySize journals are kept for undo.
+
+
+def main():
+    # usage: python journal.py list|undo [run id]|recover [rollback|replay]
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    argument = sys.argv[2] if len(sys.argv) > 2 else None
+
+    with RenameJournal(Settings.journalPath) as journal:
+        match command:
+            case "list":
+                for run in journal.read_runs(history=True).values():
+                    state = run["result"] if run["ended"] else "unfinished"
+                    print(f"{run['id']} - {run['kind']} - {time.ctime(run['time'])} - {len(run['steps'])} steps - {state}")
+            case "undo":
+                runId, failed = journal.undo(argument)
+                print(f"Undid run {runId}" + (f", {len(failed)} files could not be restored" if failed else ""))
+            case "recover":
+                for runId, result in journal.recover(argument or Settings.journalRecovery):
+                    print(f"Recovered run {runId} ({result})")
+            case _:
+                print(f"Unknown command: {command}. Needs to be 'list', 'undo' or 'recover'")
+
+
+class RenameJournal:
+    def __init__(self, journalPath, batchSize:int = Settings.journalBatchSize, batchWindow:float = Settings.journalBatchWindow,
+                 historySize:int = Settings.journalHistorySize):
+        self.journalPath = Path(journalPath)
+        self.batchSize = batchSize
+        self.batchWindow = batchWindow # seconds
+        self.historySize = historySize # rotated journals kept for undo
+        self._pending = [] # lines waiting for the next group commit
+        self._pendingSince = None
+        self._openRuns = set() # runs begun (or being recovered) but not ended yet
+        self.journalPath.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.journalPath, "a", encoding="utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # Writing
+
+    def _write(self, entry:dict):
+        if not self._pending:
+            self._pendingSince = time.monotonic()
+        self._pending.append(json.dumps(entry) + "\n")
+
+    @instrumentation.timed("journal.commit")
+    def commit(self):
+    # writes all pending entries with a single fsync
+        if not self._pending:
+            return
+        self._file.writelines(self._pending)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending.clear()
+        self._pendingSince = None
+
+    def begin_run(self, steps:list, kind:str = "rename", undoes:str = None) -> str:
+    # journals all planned (source, target) steps and makes them durable before anything is renamed
+        runId = uuid.uuid4().hex
+        self._write({"op": "begin", "run": runId, "kind": kind, "undoes": undoes, "time": time.time()})
+        for index, (source, target) in enumerate(steps):
+            self._write({"op": "plan", "run": runId, "step": index, "src": str(source), "dst": str(target)})
+        self.commit()
+        self._openRuns.add(runId)
+        return runId
+
+    def step_done(self, runId:str, index:int, source, target):
+    # records a completed step, committed once batchSize steps are pending or batchWindow has passed
+        self._write({"op": "done", "run": runId, "step": index, "src": str(source), "dst": str(target)})
+        if len(self._pending) >= self.batchSize or time.monotonic() - self._pendingSince >= self.batchWindow:
+            self.commit()
+
+    def end_run(self, runId:str, result:str = "completed"):
+        self._write({"op": "end", "run": runId, "result": result})
+        self.commit()
+        self._openRuns.discard(runId)
+        if not self._openRuns:
+            self._rotate()
+
+    def _rotate(self):
+    # moves the journal of the finished runs to journal.1 (journal.1 to journal.2 and so on, the oldest is dropped)
+        if not self.journalPath.stat().st_size:
+            return
+        self._file.close()
+        if self.historySize:
+            for number in range(self.historySize - 1, 0, -1):
+                if self.get_history_path(number).exists():
+                    os.replace(self.get_history_path(number), self.get_history_path(number + 1))
+            os.replace(self.journalPath, self.get_history_path(1))
+        self._file = open(self.journalPath, "w", encoding="utf-8") # without history the finished runs are simply dropped
+        instrumentation.count("journal.rotate")
+
+    def get_history_path(self, number:int) -> Path:
+        return self.journalPath.with_name(f"{self.journalPath.name}.{number}")
+
+    def close(self):
+        self.commit()
+        self._file.close()
+
+    # Reading
+
+    def read_runs(self, history:bool = False) -> dict:
+    # returns the runs in journal order as run id -> dict(id, kind, undoes, time, steps, done, ended, result)
+    # only the current journal (all runs that can still be open) unless history includes the rotated ones
+        self.commit()
+        runs = dict()
+        journalPaths = [self.get_history_path(number) for number in range(self.historySize, 0, -1)] if history else []
+        for journalPath in journalPaths + [self.journalPath]:
+            if journalPath.exists():
+                self._read_file(journalPath, runs)
+        return runs
+
+    def _read_file(self, journalPath:Path, runs:dict):
+        with open(journalPath, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError: # torn write at the end of the journal
+                    continue
+                if entry["op"] != "begin" and entry["run"] not in runs: # its start was rotated out of the history
+                    continue
+                match entry["op"]:
+                    case "begin":
+                        runs[entry["run"]] = {"id": entry["run"], "kind": entry["kind"], "undoes": entry.get("undoes"),
+                                              "time": entry["time"], "steps": [], "done": dict(), "ended": False, "result": None}
+                    case "plan":
+                        runs[entry["run"]]["steps"].append((entry["src"], entry["dst"]))
+                    case "done":
+                        runs[entry["run"]]["done"][entry["step"]] = (entry["src"], entry["dst"])
+                    case "end":
+                        runs[entry["run"]]["ended"] = True
+                        runs[entry["run"]]["result"] = entry["result"]
+
+    # Recovery
+
+    def recover(self, mode:str = Settings.journalRecovery) -> list:
+    # finishes (replay) or reverts (rollback) every interrupted run, returns a list of (run id, mode or "failed")
+    # a run that can't be recovered (a name was taken since the crash) is ended as "failed", so startup goes on
+        if mode not in ("replay", "rollback"):
+            raise ValueError(f"Invalid recovery mode: {mode}. Needs to be 'replay' or 'rollback'")
+
+        recovered = []
+        unfinished = [run for run in self.read_runs().values() if not run["ended"]]
+        self._openRuns.update(run["id"] for run in unfinished) # the journal is only rotated after the last one
+        for run in unfinished:
+            result = mode
+            try:
+                completed = get_completed_steps(run)
+                if mode == "replay":
+                    for index in range(len(completed), len(run["steps"])):
+                        source, target = run["steps"][index]
+                        os.makedirs(os.path.dirname(target), exist_ok=True) # folder sorting moves into new directories
+                        rename_no_replace(source, target)
+                        self.step_done(run["id"], index, source, target)
+                else:
+                    for source, target in reversed(completed):
+                        rename_no_replace(target, source)
+            except OSError as error: # later steps can depend on the failed one, so the run stops here
+                print(f"Cannot {mode} run {run['id']}: {error}")
+                result = "failed"
+            self.end_run(run["id"], result)
+            recovered.append((run["id"], result))
+        if not self._openRuns: # finished runs left over from an earlier session are rotated as well
+            self._rotate()
+        return recovered
+
+    def undo(self, runId:str = None) -> tuple:
+    # reverts a finished run (the last rename run by default) as a new journaled run
+    # returns the undone run id and a list of steps that couldn't be reverted
+        runs = self.read_runs(history=True)
+        undone = {run["undoes"] for run in runs.values() if run["kind"] == "undo" and run["result"] in ("completed", "replay")}
+        finished = [run["id"] for run in runs.values() if run["kind"] == "rename" and run["result"] in ("completed", "replay", "cancelled")]
+        if runId is None:
+            candidates = [finishedId for finishedId in finished if finishedId not in undone and get_undo_steps(runs[finishedId])]
+            if not candidates:
+                raise ValueError("No run left to undo")
+            runId = candidates[-1]
+        elif runId not in finished:
+            raise ValueError(f"{runId} is not a finished rename run")
+        elif runId in undone:
+            raise ValueError(f"{runId} was already undone")
+
+        steps = get_undo_steps(runs[runId])
+        undoId = self.begin_run(steps, "undo", runId)
+        failed = []
+        for index, (source, target) in enumerate(steps):
+            try:
+                rename_no_replace(source, target)
+            except OSError as error: # name taken or file gone since the run
+                print(f"Cannot restore {target}: {error}")
+                failed.append((source, target))
+                continue
+            self.step_done(undoId, index, source, target)
+        self.end_run(undoId, "completed")
+        return runId, failed
+
+
+def get_undo_steps(run:dict) -> list:
+# the (source, target) steps that revert a finished run, empty if the run didn't rename anything
+    # a cancelled run stopped after its last 'done' step
+    numSteps = max(run["done"], default=-1) + 1 if run["result"] == "cancelled" else len(run["steps"])
+    return [(target, source) for source, target in reversed([run["done"].get(index, step) for index, step in enumerate(run["steps"][:numSteps])])]
+
+
+def get_completed_steps(run:dict) -> list:
+# Steps run strictly one after another, so the completed steps are a prefix of the plan.
+# The end of that prefix is the last durable 'done' entry, or a later step that visibly happened on disk.
+    steps = [run["done"].get(index, step) for index, step in enumerate(run["steps"])]
+    lastDone = max(run["done"], default=-1)
+    for index in range(len(steps) - 1, lastDone, -1):
+        source, target = steps[index]
+        if os.path.lexists(source) and os.path.lexists(target) and os.path.samefile(source, target):
+            os.unlink(source) # interrupted between link and unlink (see rename_no_replace)
+        if not os.path.lexists(source) and os.path.lexists(target):
+            lastDone = index
+            break
+    return steps[:lastDone + 1]
+
+
+if __name__ == "__main__":
+    main()
@@ -1,127 +1,131 @@
 
-from collections import defaultdict, namedtuple
-from heapq import heappop, heappush
+from collections import namedtuple
 
 import customtkinter as ctk
 
+import renamer
 import utilities as util
-from mapicture import Photo, supportedFormats
+from exifindex import ExifIndex
+from journal import RenameJournal
+from mapicture import Photo, PhotoRegistry, supportedFormats
+from ordering import numberingScopes
+from renamer import RenameEngine
+from settings import Settings
+from thumbnails import ThumbnailLoader
+from worker import Finished, Progress, RenameWorker, ScanWorker
 
 
 # Generic Listbox widget, which ctk doesn't naturally support
 class File_Listbox(ctk.CTkScrollableFrame):
+    textButton = {
+        "font": ('Helvetica', 14),
+        "fg_color": "#405480",
+        "text_color": "#FFFFFF",
+        "text_color_disabled": "#FFFFFF"
+    }
+    utilityButton = {
+        "font": ('Helvetica', 14, 'bold'),
+        "fg_color": {
+            "delete": "#6a0f0f",
+            "up": "#002980",
+            "down": "#002980"
+        },
+
+        "hover_color": {
+            "delete": "#500b0b",
+            "up": "#170080",
+            "down": "#170080"
+        },
+
+        "fg_color_disabled":{
+            "delete": "#775555",
+            "up": "#505f80",
+            "down": "#505f80"
+        }
+    }
+
     def __init__(self, master):
         super().__init__(master)
         self.items = set()
         self.itemsDetails = [] 
         self.columnconfigure(0, weight=1)
         self.columnconfigure((1,2,3), weight=0)
-        self.textButton = {
-            "font": ('Helvetica', 14),
-            "fg_color": "#405480",
-            "text_color": "#FFFFFF",
-            "text_color_disabled": "#FFFFFF"
-        }
-        self.utilityButton = {
-            "font": ('Helvetica', 14, 'bold'),
-            "fg_color": {
-                "delete": "#6a0f0f",
-                "up": "#002980",
-                "down": "#002980"
-            },
-
-            "hover_color": {
-                "delete": "#500b0b",
-                "up": "#170080",
-                "down": "#170080"
-            },
-
-            "fg_color_disabled":{
-                "delete": "#775555",
-                "up": "#505f80",
-                "down": "#505f80"
-            }
-        }
     
     def add_item(self, item:str, category:str = "none"):
-        if item not in self.items:
-            self.items.add(item)
-            itemIndex = self.itemsDetails.__len__()
-
-            # create new entry as dict
-            newEntry = {
-                'index': itemIndex,
-                'fullName': item,
-                'name': util.get_filename(item),
-                'category':category,
-                'button': ctk.CTkButton(self, 
-                                        text=util.get_filename(item), 
-                                        state="disabled",
-                                        fg_color=self.textButton["fg_color"],
-                                        text_color=self.textButton["text_color"], 
-                                        text_color_disabled=self.textButton["text_color_disabled"], 
-                                        font=self.textButton["font"]
-                                        ),
-                'downButton': ctk.CTkButton(self, font=self.utilityButton["font"], text="▼", width=0),
-                'upButton': ctk.CTkButton(self, font=self.utilityButton["font"], text="▲", width=0),
-                'deleteButton': ctk.CTkButton(self, font=self.utilityButton["font"], text="X", width=0),
-
-            }
-
-            #insert into list at correct position
-            #DEBUG: print(f"ItemIndex: {itemIndex}")
-            self.itemsDetails.insert(itemIndex, newEntry)
-            self.assign_functions(itemIndex)
-            if itemIndex > 0:
-                self.assign_functions(itemIndex-1) # need to update functions on second to last button
-            self.rearrange_list()
-    
-    def assign_functions(self, index):
-        index = self.itemsDetails[index]['index']
-        upButton = self.itemsDetails[index]['upButton']
-        downButton = self.itemsDetails[index]['downButton']
-        deleteButton = self.itemsDetails[index]['deleteButton']
-
-        #declare temp functions
-        def upFunc(index):
-            def _funcUp():
-                self.move_item(index, "up")
-            return _funcUp
-        
-        def downFunc(index):
-            def _funcDown():
-                self.move_item(index, "down")
-            return _funcDown
-        
-        def deleteFunc(index):
-            def _funcDel():
-                self.delete_item(index, self.itemsDetails[index]['fullName'])
-            return _funcDel
-
-        # assign new functions
-        upButton.configure(command=upFunc(index), state="normal", fg_color=self.utilityButton["fg_color"]["up"], hover_color=self.utilityButton["hover_color"]["up"])
-        downButton.configure(command=downFunc(index), state="normal", fg_color=self.utilityButton["fg_color"]["down"], hover_color=self.utilityButton["hover_color"]["down"])
-        deleteButton.configure(command=deleteFunc(index), state="normal", fg_color=self.utilityButton["fg_color"]["delete"], hover_color=self.utilityButton["hover_color"]["delete"])
+        self.add_items([item], category)
+
+    def add_items(self, items:list, category:str = "none"):
+    # adds all new items first, then updates the layout once
+        added = False
+        for item in items:
+            if item not in self.items:
+                self.items.add(item)
+                self.itemsDetails.append(self.create_entry(item, category))
+                added = True
+        if added:
+            self.refresh()
+
+    def create_entry(self, item:str, category:str) -> dict:
+        newEntry = {
+            'index': len(self.itemsDetails),
+            'fullName': item,
+            'name': util.get_filename(item),
+            'category':category,
+            'row': None, # grid row the widgets are placed in
+            'state': None, # (first, last) the buttons were configured for
+            'button': ctk.CTkButton(self, 
+                                    text=util.get_filename(item), 
+                                    state="disabled",
+                                    fg_color=self.textButton["fg_color"],
+                                    text_color=self.textButton["text_color"], 
+                                    text_color_disabled=self.textButton["text_color_disabled"], 
+                                    font=self.textButton["font"]
+                                    ),
+            'downButton': ctk.CTkButton(self, font=self.utilityButton["font"], text="▼", width=0),
+            'upButton': ctk.CTkButton(self, font=self.utilityButton["font"], text="▲", width=0),
+            'deleteButton': ctk.CTkButton(self, font=self.utilityButton["font"], text="X", width=0),
+        }
+        # the commands hold the entry itself and read its current index when clicked,
+        # so reordering never needs to reassign them
+        newEntry['upButton'].configure(command=lambda: self.move_item(newEntry['index'], "up"))
+        newEntry['downButton'].configure(command=lambda: self.move_item(newEntry['index'], "down"))
+        newEntry['deleteButton'].configure(command=lambda: self.remove_items([newEntry['fullName']]))
+        return newEntry
+
+    def refresh(self):
+    # single pass after any change, only touches rows whose position or first/last state changed
+        lastIndex = len(self.itemsDetails) - 1
+        for _index, entry in enumerate(self.itemsDetails):
+            entry['index'] = _index
+            if entry['row'] != _index:
+                entry['row'] = _index
+                entry['button'].grid(row=_index, column=0, padx=1, sticky="EW")
+                entry['downButton'].grid(row=_index, column=1, padx=1, sticky="EW")
+                entry['upButton'].grid(row=_index, column=2, padx=1, sticky="EW")
+                entry['deleteButton'].grid(row=_index, column=3, padx=1, sticky="EW")
+            state = (_index == 0, _index == lastIndex)
+            if entry['state'] != state:
+                entry['state'] = state
+                self.configure_buttons(entry)
+
+    def configure_buttons(self, entry:dict):
+        upButton = entry['upButton']
+        downButton = entry['downButton']
+        deleteButton = entry['deleteButton']
+        upButton.configure(state="normal", fg_color=self.utilityButton["fg_color"]["up"], hover_color=self.utilityButton["hover_color"]["up"])
+        downButton.configure(state="normal", fg_color=self.utilityButton["fg_color"]["down"], hover_color=self.utilityButton["hover_color"]["down"])
+        deleteButton.configure(state="normal", fg_color=self.utilityButton["fg_color"]["delete"], hover_color=self.utilityButton["hover_color"]["delete"])
 
         # special cases
         ## disable up/down buttons on top and bottom element
-        if index == 0:
+        isFirst, isLast = entry['state']
+        if isFirst:
             upButton.configure(state="disabled", fg_color=self.utilityButton["fg_color_disabled"]["up"])
-        elif index == len(self.itemsDetails)-1:
+        if isLast:
             downButton.configure(state="disabled", fg_color=self.utilityButton["fg_color_disabled"]["down"])
         ## disable delete button on protected tags
-        if self.itemsDetails[index]["category"] in app._protectedTags:
+        if entry["category"] in app._protectedTags:
             deleteButton.configure(state="disabled", fg_color=self.utilityButton["fg_color_disabled"]["delete"])
-            
-            
-
-    def rearrange_list (self):
-        for _index, entry in enumerate(self.itemsDetails):
-            entry['index'] = _index
-            entry['button'].grid(row=entry['index'], column=0, padx=1, sticky="EW")
-            entry['downButton'].grid(row=entry['index'], column=1, padx=1, sticky="EW")
-            entry['upButton'].grid(row=entry['index'], column=2, padx=1, sticky="EW")
-            entry['deleteButton'].grid(row=entry['index'], column=3, padx=1, sticky="EW")
 
     def move_item(self, index:int, direction:str):
         if direction == "up":
@@ -140,63 +144,46 @@ class File_Listbox(ctk.CTkScrollableFrame):
             raise ValueError(f"Invalid direction: {direction}. Needs to be 'up' or 'down'")
     
     def swap_items(self,indexA:int, indexB:int):
-        
-        #DEBUG print(f"Swapping item {indexA}: {self.itemsDetails[indexA]['fullName']}, with {indexB}: {self.itemsDetails[indexB]['fullName']}")
-        #DEBUG print("Before:\n")
-        #DEBUG self.print_item_list()
-
-        # swap entries
-        tempEntryA = self.itemsDetails[indexA] # temporarily save data from A
-        self.itemsDetails[indexA] = self.itemsDetails[indexB]
-        self.itemsDetails[indexB] = tempEntryA
-
-        # update index values
-        self.itemsDetails[indexA]['index'] = indexA
-        self.itemsDetails[indexB]['index'] = indexB
-
-        # Index values are now correct, but buttons still contain wrong function arguments
-        self.assign_functions(indexA)
-        self.assign_functions(indexB)
-        self.rearrange_list()
-
-        #DEBUG print("After: \n")
-        #DEBUG self.print_item_list()
+        self.itemsDetails[indexA], self.itemsDetails[indexB] = self.itemsDetails[indexB], self.itemsDetails[indexA]
+        self.refresh()
+
+    def move_items(self, items:list, index:int):
+    # moves the given items (keeping their current order) so the first one ends up at index
+        moving = set(items)
+        moved = [entry for entry in self.itemsDetails if entry['fullName'] in moving]
+        remaining = [entry for entry in self.itemsDetails if entry['fullName'] not in moving]
+        index = max(0, min(index, len(remaining)))
+        self.itemsDetails = remaining[:index] + moved + remaining[index:]
+        self.refresh()
     
     def delete_item(self, index:int, item:str):
+        self.remove_items([item])
+
+    def remove_items(self, items:list):
+    # removes all given items, then updates the layout once
+        removing = set(items) & self.items
+        if not removing:
+            return
+        remaining = []
+        for entry in self.itemsDetails:
+            if entry['fullName'] in removing:
+                for key in ("button", "downButton", "upButton", "deleteButton"):
+                    entry[key].destroy()
+            else:
+                remaining.append(entry)
+        self.items -= removing
+        self.itemsDetails = remaining
+        self.refresh()
 
-        for key in ("button", "downButton", "upButton", "deleteButton"):
-            self.itemsDetails[index][key].destroy()
-
-        self.items.remove(item)
-        self.itemsDetails.pop(index)
-        #DEBUG print(f"Removed: {item} at position: {index}")
-        self.rearrange_list()
-        #DEBUG self.print_item_list()
-        # reassign all function buttons
-        for _index, value in enumerate(self.itemsDetails):
-            self.assign_functions(_index)
+    def clear(self):
+    # clear all entries from the list, except protected tags
+        self.remove_items([item['fullName'] for item in self.itemsDetails if item["category"] not in app._protectedTags])
 
     def delete_all(self):
-    #todo currently only deletes half of the items???
-    # hypthesis: index is defined before deletion, but invalid after every deleted item (because the index is adjusted afterwards)
-
-
-    # clear all entries from the list
-        for item in self.itemsDetails[:]:
-            if item["category"] in app._protectedTags:
-                pass # don't remove
-            else:
-                for key in ("button", "downButton", "upButton", "deleteButton"): # destroy all attached buttons
-                    item[key].destroy()
-
-                self.items.remove(item['fullName'])
-                self.itemsDetails.remove(item)
-        self.rearrange_list() # still need to rearrange at the end to account for protected tags    
+        self.clear()
     
     def delete_category(self, category:str):
-        for index, item in enumerate(self.itemsDetails):
-            if item["category"] == category:
-                self.delete_item(index, item["fullName"])
+        self.remove_items([item['fullName'] for item in self.itemsDetails if item["category"] == category])
 
     def update_category(self, category:str):
         element = app.get_category_elements(category)
@@ -225,6 +212,276 @@ class File_Listbox(ctk.CTkScrollableFrame):
     def get_itemsDetails(self):
         return self.itemsDetails
 
+# File list for very large selections: keeps all items in a model, but only creates widgets for the
+# visible rows (plus a few spare ones). Scrolling re-uses the same widgets for other items.
+class Virtual_File_Listbox(ctk.CTkFrame):
+    def __init__(self, master, rowHeight:int = Settings.virtualRowHeight, overscan:int = Settings.virtualOverscan,
+                 thumbnails:ThumbnailLoader = None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.items = set()
+        self.itemsDetails = [] # model, entries don't hold any widgets
+        self.rowHeight = rowHeight
+        self.thumbnails = thumbnails # optional ThumbnailLoader, rows then show a preview next to the name
+        self.placeholder = None
+        self._thumbnailImages = dict() # path -> (PIL image, CTkImage), so redrawing a row doesn't convert it again
+        self._thumbnailPolling = False
+        if thumbnails is not None:
+            from PIL import Image
+            self.rowHeight = max(rowHeight, thumbnails.size + 8)
+            self.placeholder = ctk.CTkImage(Image.new("RGB", (thumbnails.size, thumbnails.size), "gray50"), size=(thumbnails.size, thumbnails.size))
+        self.overscan = overscan # rows created beyond the visible ones, so small resizes don't create widgets
+        self.firstRow = 0 # index of the item shown in the top row
+        self.rows = [] # pool of row widgets
+        self._refreshPending = False
+
+        self.columnconfigure(0, weight=1)
+        self.columnconfigure((1,2,3), weight=0)
+        self.textButton = File_Listbox.textButton # same look as File_Listbox
+        self.utilityButton = File_Listbox.utilityButton
+
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scrollbar)
+        self.scrollbar.grid(row=0, column=4, rowspan=1000, sticky="NS")
+        self.bind("<Configure>", self.on_resize)
+        self.bind_scroll(self)
+
+    # Widgets
+
+    def bind_scroll(self, widget):
+        widget.bind("<MouseWheel>", self.on_mousewheel) # Windows/macOS
+        widget.bind("<Button-4>", lambda event: self.scroll_to(self.firstRow - 3)) # Linux
+        widget.bind("<Button-5>", lambda event: self.scroll_to(self.firstRow + 3))
+
+    def create_row(self, rowIndex:int) -> dict:
+        # commands look up the item shown in the row when clicked, so scrolling never rebinds them
+        row = {
+            'button': ctk.CTkButton(self,
+                                    state="disabled",
+                                    fg_color=self.textButton["fg_color"],
+                                    text_color=self.textButton["text_color"],
+                                    text_color_disabled=self.textButton["text_color_disabled"],
+                                    font=self.textButton["font"],
+                                    height=self.rowHeight - 4,
+                                    image=self.placeholder,
+                                    compound="left"
+                                    ),
+            'downButton': ctk.CTkButton(self, font=self.utilityButton["font"], text="▼", width=0,
+                                        command=lambda: self.move_item(self.firstRow + rowIndex, "down")),
+            'upButton': ctk.CTkButton(self, font=self.utilityButton["font"], text="▲", width=0,
+                                      command=lambda: self.move_item(self.firstRow + rowIndex, "up")),
+            'deleteButton': ctk.CTkButton(self, font=self.utilityButton["font"], text="X", width=0,
+                                          command=lambda: self.delete_row(rowIndex)),
+        }
+        for column, key in enumerate(("button", "downButton", "upButton", "deleteButton")):
+            row[key].grid(row=rowIndex, column=column, padx=1, pady=1, sticky="EW")
+            self.bind_scroll(row[key])
+        return row
+
+    def get_visible_rows(self) -> int:
+        return max(1, self.winfo_height() // self.rowHeight)
+
+    def refresh(self):
+    # schedules a redraw, several changes in a row only redraw once
+        if not self._refreshPending:
+            self._refreshPending = True
+            self.after_idle(self._refresh)
+
+    def _refresh(self):
+        self._refreshPending = False
+        visibleRows = self.get_visible_rows()
+        while len(self.rows) < visibleRows + self.overscan:
+            self.rows.append(self.create_row(len(self.rows)))
+
+        self.firstRow = max(0, min(self.firstRow, len(self.itemsDetails) - visibleRows))
+        for rowIndex, row in enumerate(self.rows):
+            itemIndex = self.firstRow + rowIndex
+            if rowIndex < visibleRows and itemIndex < len(self.itemsDetails):
+                self.show_item(row, self.itemsDetails[itemIndex])
+            else:
+                for widget in row.values():
+                    widget.grid_remove()
+
+        if self.thumbnails is not None:
+            self.request_thumbnails()
+
+        if self.itemsDetails:
+            self.scrollbar.set(self.firstRow / len(self.itemsDetails), min(1.0, (self.firstRow + visibleRows) / len(self.itemsDetails)))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def show_item(self, row:dict, item:dict):
+        row['button'].configure(text=item['name'])
+        if self.thumbnails is not None:
+            row['button'].configure(image=self.get_thumbnail(item['fullName']))
+        for key, direction in (("upButton", "up"), ("downButton", "down"), ("deleteButton", "delete")):
+            row[key].configure(state="normal", fg_color=self.utilityButton["fg_color"][direction], hover_color=self.utilityButton["hover_color"][direction])
+
+        # special cases
+        ## disable up/down buttons on top and bottom element
+        if item['index'] == 0:
+            row['upButton'].configure(state="disabled", fg_color=self.utilityButton["fg_color_disabled"]["up"])
+        if item['index'] == len(self.itemsDetails)-1:
+            row['downButton'].configure(state="disabled", fg_color=self.utilityButton["fg_color_disabled"]["down"])
+        ## disable delete button on protected tags
+        if item["category"] in app._protectedTags:
+            row['deleteButton'].configure(state="disabled", fg_color=self.utilityButton["fg_color_disabled"]["delete"])
+
+        for widget in row.values():
+            widget.grid()
+
+    # Thumbnails
+
+    def get_thumbnail(self, filepath:str) -> ctk.CTkImage:
+    # the preview if it's loaded, the placeholder otherwise
+        image = self.thumbnails.get(filepath)
+        if image is None:
+            return self.placeholder
+        cached = self._thumbnailImages.get(filepath)
+        if cached is None or cached[0] is not image:
+            if len(self._thumbnailImages) >= self.thumbnails.memorySize:
+                self._thumbnailImages.clear()
+            cached = self._thumbnailImages[filepath] = (image, ctk.CTkImage(image, size=image.size))
+        return cached[1]
+
+    def request_thumbnails(self):
+    # only the rows that are shown (including overscan) are loaded, top row first
+        visible = self.itemsDetails[self.firstRow:self.firstRow + len(self.rows)]
+        self.thumbnails.request([item['fullName'] for item in visible])
+        if not self._thumbnailPolling:
+            self._thumbnailPolling = True
+            self.after(int(Settings.thumbnailPollInterval * 1000), self.poll_thumbnails)
+
+    def poll_thumbnails(self):
+    # puts finished previews into their rows, stops polling once the loader is idle
+        finished = set(self.thumbnails.get_finished())
+        for rowIndex, row in enumerate(self.rows[:self.get_visible_rows()]):
+            itemIndex = self.firstRow + rowIndex
+            if itemIndex < len(self.itemsDetails) and self.itemsDetails[itemIndex]['fullName'] in finished:
+                row['button'].configure(image=self.get_thumbnail(self.itemsDetails[itemIndex]['fullName']))
+        if self.thumbnails.is_busy():
+            self.after(int(Settings.thumbnailPollInterval * 1000), self.poll_thumbnails)
+        else:
+            self._thumbnailPolling = False
+
+    # Scrolling
+
+    def scroll_to(self, firstRow:int):
+        self.firstRow = max(0, min(firstRow, len(self.itemsDetails) - self.get_visible_rows()))
+        self.refresh()
+
+    def on_mousewheel(self, event):
+        self.scroll_to(self.firstRow - round(event.delta / 40))
+
+    def on_scrollbar(self, *args):
+        match args:
+            case ("moveto", fraction):
+                self.scroll_to(round(float(fraction) * len(self.itemsDetails)))
+            case ("scroll", amount, "units"):
+                self.scroll_to(self.firstRow + int(amount))
+            case ("scroll", amount, "pages"):
+                self.scroll_to(self.firstRow + int(amount) * self.get_visible_rows())
+
+    def on_resize(self, event):
+        self.refresh()
+
+    # Model (same interface as File_Listbox)
+
+    def add_item(self, item:str, category:str = "none"):
+        self.add_items([item], category)
+
+    def add_items(self, items:list, category:str = "none"):
+        for item in items:
+            if item not in self.items:
+                self.items.add(item)
+                self.itemsDetails.append({
+                    'index': len(self.itemsDetails),
+                    'fullName': item,
+                    'name': util.get_filename(item),
+                    'category': category
+                })
+        self.refresh()
+
+    def reindex(self, start:int = 0):
+        for _index in range(start, len(self.itemsDetails)):
+            self.itemsDetails[_index]['index'] = _index
+
+    def move_item(self, index:int, direction:str):
+        if direction == "up":
+            if (index-1) >= 0:
+                self.swap_items(index-1, index)
+        elif direction == "down":
+            if (index+1) < len(self.itemsDetails):
+                self.swap_items(index, index+1)
+        else:
+            raise ValueError(f"Invalid direction: {direction}. Needs to be 'up' or 'down'")
+
+    def swap_items(self, indexA:int, indexB:int):
+        self.itemsDetails[indexA], self.itemsDetails[indexB] = self.itemsDetails[indexB], self.itemsDetails[indexA]
+        self.itemsDetails[indexA]['index'] = indexA
+        self.itemsDetails[indexB]['index'] = indexB
+        self.refresh()
+
+    def move_items(self, items:list, index:int):
+    # moves the given items (keeping their current order) so the first one ends up at index
+        moving = set(items)
+        moved = [entry for entry in self.itemsDetails if entry['fullName'] in moving]
+        remaining = [entry for entry in self.itemsDetails if entry['fullName'] not in moving]
+        index = max(0, min(index, len(remaining)))
+        self.itemsDetails = remaining[:index] + moved + remaining[index:]
+        self.reindex()
+        self.refresh()
+
+    def delete_row(self, rowIndex:int):
+        index = self.firstRow + rowIndex
+        if index < len(self.itemsDetails):
+            self.delete_item(index, self.itemsDetails[index]['fullName'])
+
+    def delete_item(self, index:int, item:str):
+        self.items.remove(item)
+        self.itemsDetails.pop(index)
+        self.reindex(index)
+        self.refresh()
+
+    def remove_items(self, items:list):
+        removing = set(items) & self.items
+        if removing:
+            self.itemsDetails = [item for item in self.itemsDetails if item['fullName'] not in removing]
+            self.items -= removing
+            self.reindex()
+            self.refresh()
+
+    def clear(self):
+        # protected tags stay
+        self.remove_items([item['fullName'] for item in self.itemsDetails if item["category"] not in app._protectedTags])
+
+    def delete_all(self):
+        self.clear()
+
+    def delete_category(self, category:str):
+        self.remove_items([item['fullName'] for item in self.itemsDetails if item["category"] == category])
+
+    def update_category(self, category:str):
+        element = app.get_category_elements(category)
+
+        for item in self.itemsDetails:
+            if item["category"] == category:
+                self.items.remove(item["fullName"])
+                self.items.add(element.dropvalue)
+                item["name"] = element.dropvalue
+                item["fullName"] = element.dropvalue
+        self.refresh()
+
+    def get_special_items(self, categoryList:list):
+    # returns all items that match the provided categories
+        return [item for category in categoryList for item in self.itemsDetails if item["category"] == category]
+
+    def print_item_list(self):
+        for index, entry in enumerate(self.itemsDetails):
+            print(f"ListIndex: {index} - IndexValue: {entry['index']} - Name: {entry['name']} - Category: {entry['category']}")
+
+    def get_itemsDetails(self):
+        return self.itemsDetails
+
+
 # Main app window 
 class App(ctk.CTk):
     def __init__(self):
@@ -245,16 +502,16 @@ class App(ctk.CTk):
         ctk.set_default_color_theme("blue")  # Themes: "blue" (default), "green", "dark-blue"
         
         # "Constants" / variables (should not be changed)
-        separators = ["", "-", "_"]
-        dateComponents = ["YYYY", "MM", "DD"]
-        timeComponents = ["hh", "mm", "ss"]
-        self._iteratorComponents = "##"
-        self._categoryDate = "date" # these strings are used to categorize individual tags and treat them differently
-        self._categoryTime = "time"
-        self._categoryIterator = "iterator"
-        self._categoryTag = "customTag"
-        self._categoryFile = "filepath"
-        self._protectedTags = (self._categoryTime, self._categoryDate, self._categoryIterator) # these will be protected from removal
+        separators = renamer.separators
+        dateComponents = renamer.dateComponents
+        timeComponents = renamer.timeComponents
+        self._iteratorComponents = renamer.iteratorComponents
+        self._categoryDate = renamer.categoryDate # these strings are used to categorize individual tags and treat them differently
+        self._categoryTime = renamer.categoryTime
+        self._categoryIterator = renamer.categoryIterator
+        self._categoryTag = renamer.categoryTag
+        self._categoryFile = renamer.categoryFile
+        self._protectedTags = renamer.protectedTags # these will be protected from removal
         self._supportedFormats = supportedFormats
         self._errorMsgFormat = {"font": ('Helvetica', 14, 'bold')}
 
@@ -267,7 +524,13 @@ class App(ctk.CTk):
         self.defaultSeparator = "_"
         self.fileset = set()
         self.tagDictList = []
-        self.dateIdDict = defaultdict(list)
+        self.photoRegistry = PhotoRegistry(index=ExifIndex(Settings.exifIndexPath) if Settings.exifIndexPath else None)
+        self.journal = RenameJournal(Settings.journalPath)
+        for runId, result in self.journal.recover(Settings.journalRecovery): # clean up after a crash during the last session
+            print(f"Interrupted run {runId}: {result}")
+        self.engine = RenameEngine(self.photoRegistry, self.defaultSeparator, self.journal)
+        self.renameWorker = None # RenameWorker of the running batch
+        self.scanWorkers = [] # ScanWorker of every folder that is still being scanned
         self.customTag = False
         self.dateTag = False
         self.timeTag = False
@@ -287,12 +550,19 @@ class App(ctk.CTk):
         self.filesFrame.label.grid(row=0, column=0, columnspan=3, padx=10, pady=10, sticky="NEW")
         
         ## File List
-        self.filesBox = File_Listbox(self.filesFrame)
-        self.filesBox.grid(row=1, column=0, columnspan=3, pady=10, padx=10, sticky="NWE")
+        if Settings.virtualFileList:
+            self.filesBox = Virtual_File_Listbox(self.filesFrame, thumbnails=ThumbnailLoader() if Settings.thumbnails else None)
+            self.filesBox.grid(row=1, column=0, columnspan=3, pady=10, padx=10, sticky="NSWE")
+            self.filesFrame.rowconfigure(1, weight=1)
+        else:
+            self.filesBox = File_Listbox(self.filesFrame)
+            self.filesBox.grid(row=1, column=0, columnspan=3, pady=10, padx=10, sticky="NWE")
 
         ## File management buttons
         self.filesAddButton = ctk.CTkButton(self.filesFrame, text="Add files", command=self.select_file)
         self.filesAddButton.grid(column=2,row=2, pady=10, padx=10, sticky="E")
+        self.filesAddFolderButton = ctk.CTkButton(self.filesFrame, text="Add folder", command=self.select_folder)
+        self.filesAddFolderButton.grid(column=0,row=2, pady=10, padx=10, sticky="E")
         self.filesClearButton = ctk.CTkButton(self.filesFrame, text="Clear all", command=self.filesBox.delete_all)
         self.filesClearButton.grid(column=1,row=2, pady=10, padx=10, sticky="E")
 
@@ -303,7 +573,7 @@ class App(ctk.CTk):
         self.configFrame.grid(row=1, column=1, pady=10, padx=10, sticky="NSWE")
         self.configFrame.columnconfigure(0, weight=1)
         self.configFrame.rowconfigure((3,), weight=1)
-        self.configFrame.rowconfigure((1, 2, 90, 95, 99), weight=0)
+        self.configFrame.rowconfigure((1, 2, 90, 95, 97, 98, 99, 100), weight=0)
 
         ## Label
         self.configFrame._label = "Configure filename tags"
@@ -357,10 +627,26 @@ class App(ctk.CTk):
 
         self.configIteratorCheck = ctk.CTkCheckBox(self.configFrame, text="Add Iterator Tag", command= lambda: self.toggle_special_tag(self._categoryIterator))
         self.configIteratorCheck.grid(row=95, pady=5, padx=20, sticky="SW")
+
+        def update_iterator_scope(value):
+            self.engine.iteratorScope = value
+
+        self.configIteratorScopeDrop = ctk.CTkComboBox(self.configFrame, values=list(numberingScopes), state="readonly", command=update_iterator_scope)
+        self.configIteratorScopeDrop.grid(row=96, pady=5, padx=20, sticky="SWE")
+        self.configIteratorScopeDrop.set(value=Settings.iteratorScope)
         
+        ## Progress of a running batch
+        self.progressBar = ctk.CTkProgressBar(self.configFrame)
+        self.progressBar.grid(row=97, pady=5, padx=20, sticky="SWE")
+        self.progressBar.set(0)
+        self.progressLabel = ctk.CTkLabel(self.configFrame, text="")
+        self.progressLabel.grid(row=98, pady=5, padx=20, sticky="SW")
+
         ## Submit button
         self.confirmButton = ctk.CTkButton(self.configFrame, text="Rename Files", command=self.rename_all_files)
-        self.confirmButton.grid(row=99, pady=30, padx=20, sticky="S")
+        self.confirmButton.grid(row=99, pady=(30, 5), padx=20, sticky="S")
+        self.cancelButton = ctk.CTkButton(self.configFrame, text="Cancel", command=self.cancel_rename, state="disabled")
+        self.cancelButton.grid(row=100, pady=(5, 30), padx=20, sticky="S")
         
 
 
@@ -375,8 +661,31 @@ class App(ctk.CTk):
 
         files = ctk.filedialog.askopenfilenames(initialdir=startdir, filetypes=[("Images", util.concat_strings(supportedFormats, " "))])
         #DEBUG print(files)
-        for file in files:
-            self.filesBox.add_item(file, self._categoryFile)
+        self.filesBox.add_items(files, self._categoryFile)
+
+    def select_folder(self):
+        startdir = util.get_pictures_dir()
+
+        folder = ctk.filedialog.askdirectory(initialdir=startdir)
+        if folder: # scanned on a ScanWorker, poll_scan_workers adds the files as they are found
+            scanWorker = ScanWorker(folder)
+            scanWorker.start()
+            self.scanWorkers.append(scanWorker)
+            if len(self.scanWorkers) == 1:
+                self.after(round(Settings.progressInterval * 1000), self.poll_scan_workers)
+
+    def poll_scan_workers(self):
+        for scanWorker in list(self.scanWorkers):
+            for message in scanWorker.get_messages():
+                if message.paths:
+                    self.filesBox.add_items(message.paths, self._categoryFile)
+                if message.finished:
+                    self.scanWorkers.remove(scanWorker)
+        if self.scanWorkers:
+            self.progressLabel.configure(text=f"Scanning {len(self.scanWorkers)} folders...")
+            self.after(round(Settings.progressInterval * 1000), self.poll_scan_workers)
+        else:
+            self.progressLabel.configure(text="")
     
 
     # Config Frame
@@ -469,32 +778,14 @@ class App(ctk.CTk):
             tagOutput.insert(tempDict['index'], tempDict)
         return tagOutput
     
+    def get_all_filepaths(self) -> list:
+        return [item["fullName"] for item in self.filesBox.itemsDetails]
+
     def get_all_photo_generator(self):
-        for item in self.filesBox.itemsDetails:
-            outPhoto = Photo(item["fullName"])
-            yield outPhoto
+        return self.engine.get_photo_generator(self.get_all_filepaths())
 
     def generate_name(self, photo:Photo, tagDictList:list):
-        outputName = str()
-        tagList = []
-        for tag in tagDictList:
-            position = int(tag["index"])
-            match tag["category"]:
-                case self._categoryDate: #Date
-                    tag["text"] = photo.adjust_date_tag(tag["text"])
-                case self._categoryTime: #Time
-                    tag["text"] = photo.adjust_time_tag(tag["text"])
-                case self._categoryIterator: #Iterator
-                    tag["text"] = photo.adjust_iterator_tag(tag["text"])
-                case self._categoryTag: #Custom/Generic Tag
-                    pass
-                case _:
-                    raise ValueError(f"Unknown tag category: {tag['text']}")
-            tagList.insert(position, tag['text'])
-        
-        outputName = util.concat_strings(tagList, self.defaultSeparator)
-        outputName= outputName + photo.get_file_type() # add file suffix back in
-        return outputName
+        return self.engine.generate_name(photo, tagDictList)
 
 
     """ def get_custom_tags(self):
@@ -511,48 +802,77 @@ class App(ctk.CTk):
     def update_iterator_tag(self):
         numFiles = len(self.filesBox.itemsDetails)
         tagLength = len(self._iteratorComponents)
-        newTag = "#" * max(numFiles,tagLength)
+        newTag = "#" * max(len(str(numFiles)), tagLength) # enough digits to number every file
         self._iteratorComponents = newTag
 
 
     # Button to start renaming
     def rename_all_files(self):
+    # runs on a RenameWorker, poll_rename_worker shows its progress
+        if self.renameWorker is not None and self.renameWorker.is_alive():
+            return
+        if self.scanWorkers: # the file list isn't complete yet
+            self.progressLabel.configure(text=f"Scanning {len(self.scanWorkers)} folders...")
+            return
         self.update_iterator_tag()
         self.tagDictList = self.get_all_tags()
-        self.get_iterator_ids()
-        #DEBUG
-        print(self.dateIdDict)
-        
-        for photo in self.get_all_photo_generator():
-            photo.set_iterator_id(self.dateIdDict)
-            newName = photo.generate_name(self)
-            photo.setName(newName)
-            photo.print_attributes()
-            util.rename_file(photo.attributes['path_old'], photo.attributes['path'])
-            #print(f"Would rename file: {photo.attributes['name_old']} to {photo.attributes['name_new']}{photo.attributes['file_type']}")
-            #DEBUG print(f"Attributes for current photo: \nYear: {photo.attributes['YYYY']}, Minute: {photo.attributes['mm']}, Second: {photo.attributes['ss']}")
+        self.engine.defaultSeparator = self.defaultSeparator
+        self.renameWorker = RenameWorker(self.engine, self.get_all_filepaths(), self.tagDictList)
+        self.renameWorker.start()
+
+        self.confirmButton.configure(state="disabled")
+        self.cancelButton.configure(state="normal")
+        self.progressBar.set(0)
+        self.progressLabel.configure(text="Reading files...")
+        self.after(round(Settings.progressInterval * 1000), self.poll_rename_worker)
+
+    def cancel_rename(self):
+        if self.renameWorker is not None:
+            self.renameWorker.cancel()
+            self.cancelButton.configure(state="disabled")
+            self.progressLabel.configure(text="Cancelling...")
+
+    def poll_rename_worker(self):
+        for message in self.renameWorker.get_messages():
+            match message:
+                case Progress():
+                    self.show_progress(message)
+                case Finished():
+                    self.finish_rename(message)
+                    return
+        self.after(round(Settings.progressInterval * 1000), self.poll_rename_worker)
+
+    def show_progress(self, progress:Progress):
+        self.progressBar.set(progress.done / progress.total if progress.total else 0)
+        text = f"{progress.stage.capitalize()}: {progress.done}/{progress.total}"
+        if progress.rate is not None:
+            text += f" - {progress.rate:.0f} files/s"
+        if progress.eta is not None:
+            text += f" - {progress.eta:.0f} s left"
+        text += f" - {progress.errors} errors"
+        self.progressLabel.configure(text=text)
+
+    def finish_rename(self, finished:Finished):
+        if finished.error is not None:
+            text = f"Failed after {len(finished.renamed)} files: {finished.error}"
+        elif finished.cancelled:
+            text = f"Cancelled, renamed {len(finished.renamed)} files"
+        else:
+            text = f"Renamed {len(finished.renamed)} files"
+        if finished.errors:
+            text += f", skipped {len(finished.errors)} unreadable files"
+        self.progressBar.set(0 if finished.cancelled or finished.error else 1)
+        self.progressLabel.configure(text=text)
+        self.confirmButton.configure(state="normal")
+        self.cancelButton.configure(state="disabled")
     
     def get_iterator_ids(self):
-        dateHeap = []
-
-        for photo in self.get_all_photo_generator():
-            dateTime = photo.attributes["date_time"]
-            heappush(dateHeap, dateTime)
-        
-
-        idCounter = 1
-        while dateHeap:
-            currentDateTime = heappop(dateHeap)
-            self.dateIdDict[currentDateTime].append(idCounter)
-            idCounter += 1
-    
-    
-
-
+        self.engine.get_iterator_ids(self.get_all_filepaths())
 
 
-# Create the main application window
-app = App()  # Initialize the window
+if __name__ == "__main__": # worker processes (see extraction.py) import this module as well
+    # Create the main application window
+    app = App()  # Initialize the window
 
-# Run the application
-app.mainloop()
+    # Run the application
+    app.mainloop()
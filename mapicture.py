@@ -1,53 +1,90 @@
 
-from collections import defaultdict
+import functools
+import os
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date
 from pathlib import Path
 
-from PIL import Image
+import instrumentation
+import ordering
+from fileinfo import DateTimeStrTpl, PhotoMetadata, get_photo_metadata
+from formats import supportedFormats
+from settings import Settings
+from template import NameTemplate
 
-import utilities as util
-from fileinfo import get_date_time_data
-from utilities import get_PIL_supported_formats
+epochOrdinal = date(1970, 1, 1).toordinal() # timestamps are seconds since then, without time zone (like the EXIF data)
 
-supportedFormats = get_PIL_supported_formats()
+twoDigits = [f"{number:02d}" for number in range(100)] # zero padded month, day, hour, minute and second strings
 
+# stand-in for os.stat_result with the fields used after extraction (st_birthtime is None if unknown)
+FileStat = namedtuple("FileStat", ["st_size", "st_mtime_ns", "st_mtime", "st_birthtime"])
 
 
 
 class Photo:
-    def __init__(self, filepath):
+# Compact record of one photo: a single path string, the EXIF date/time as one integer and a few small values.
+# Names, date/time strings and the attributes dict are derived on access, the raw EXIF data isn't kept.
+    __slots__ = ("_path", "_pathOld", "_fileType", "_timestamp", "_subSec", "_model", "_gps", "_size", "_mtimeNs", "_birthtime", "_id")
+
+    @instrumentation.timed("photo.init")
+    def __init__(self, filepath, metadata:PhotoMetadata = None):
 
         #check input
-        self.check_filepath(filepath)
-        
-        #Properties
-        self._supportedFormats = supportedFormats
-        self._path = Path(filepath) # path object
+        with instrumentation.timer("photo.check_filepath"):
+            self.check_filepath(filepath)
         
-        # open file briefly to get image data
-        self._img = Image.open(filepath)
-        self._exif = self._img.getexif() 
-        self._img.close()
-        self._dateTimeStrTpl = get_date_time_data(filepath)
-        self.attributes = {
-            "id": int(),
-            "name": self._path.name,
-            "name_old": self._path.name,
-            "name_new": str(), # starts empty
-            "path": Path(filepath),
-            "path_new": None, # starts empty
-            "path_old": Path(filepath),
-            "was_renamed": False,
-            "date_time": self._dateTimeStrTpl.date + " " + self._dateTimeStrTpl.time,
-            "YYYY": self._dateTimeStrTpl.YYYY,
-            "MM": self._dateTimeStrTpl.MM,
-            "DD": self._dateTimeStrTpl.DD,
-            "hh": self._dateTimeStrTpl.hh,
-            "mm": self._dateTimeStrTpl.mm,
-            "ss": self._dateTimeStrTpl.ss,
-            "file_type": self._path.suffix
-            # might extend in the future if more properties are wanted
+        # open file briefly to get image data (unless it was already extracted)
+        if metadata is None:
+            metadata = get_photo_metadata(filepath)
+        dt = metadata.dateTimeStrTpl
+        stat = metadata.stat
+        self._path = str(Path(filepath)) # normalized like get_path(), so the str can be used as a key directly
+        self._pathOld = None # set once the photo was renamed
+        self._fileType = sys.intern(os.path.splitext(self._path)[1]) # same few suffixes for every photo
+        self._timestamp = ordering.get_timestamp(dt.YYYY, dt.MM, dt.DD, dt.hh, dt.mm, dt.ss)
+        self._subSec = ordering.get_sub_sec(metadata.subSec) # microseconds
+        self._model = sys.intern(metadata.model) if isinstance(metadata.model, str) else None # few distinct models per batch
+        self._gps = metadata.gps or None
+        self._size = stat.st_size
+        self._mtimeNs = stat.st_mtime_ns
+        self._birthtime = getattr(stat, "st_birthtime", None)
+        self._id = 0
+
+    @property
+    def attributes(self) -> dict:
+    # all derived values in one dict (built on every access, changing it doesn't change the photo)
+        path = self.get_path()
+        dt = self.get_date_time()
+        return {
+            "id": self._id,
+            "name": path.name,
+            "name_old": os.path.basename(self._pathOld) if self._pathOld else path.name,
+            "name_new": path.name if self._pathOld else str(),
+            "path": path,
+            "path_new": path if self._pathOld else None,
+            "path_old": Path(self._pathOld) if self._pathOld else path,
+            "was_renamed": self._pathOld is not None,
+            "date_time": dt.date + " " + dt.time,
+            "YYYY": dt.YYYY,
+            "MM": dt.MM,
+            "DD": dt.DD,
+            "hh": dt.hh,
+            "mm": dt.mm,
+            "ss": dt.ss,
+            "file_type": self.get_file_type()
         }
 
+    def get_fields(self) -> dict:
+    # the values a filename template can use (see template.py)
+        days, seconds = divmod(self._timestamp, ordering.secondsPerDay)
+        YYYY, MM, DD = get_day(days)
+        minutes, ss = divmod(seconds, 60)
+        hh, mm = divmod(minutes, 60)
+        return {"YYYY": YYYY, "MM": MM, "DD": DD, "hh": twoDigits[hh], "mm": twoDigits[mm], "ss": twoDigits[ss],
+                "id": self._id, "file_type": self._fileType}
+
     def print_attributes(self):
         for key, value in self.attributes.items():
             print(f"{key}: {value}")
@@ -69,73 +106,174 @@ class Photo:
             raise ValueError(f"{errorMSG['start']} {errorMSG['notImage']} \n Filepath given: {filepath}")
     
     def adjust_date_tag(self, dateTag:str) -> str:
-        dateTag = dateTag.replace("YYYY", self.attributes["YYYY"])
-        dateTag = dateTag.replace("MM", self.attributes["MM"])
-        dateTag = dateTag.replace("DD", self.attributes["DD"])
-        #DEBUG
-        #DEBUG print("DateTag Function:")
-        #DEBUG print(f"Name: {self.attributes['name_old']}, DateTag: {dateTag}")
-        #DEBUG print(f"YYYY: {self.attributes['YYYY']} - MM: {self.attributes['MM']} - DD: {self.attributes['DD']}")
+        dt = self.get_date_time()
+        dateTag = dateTag.replace("YYYY", dt.YYYY)
+        dateTag = dateTag.replace("MM", dt.MM)
+        dateTag = dateTag.replace("DD", dt.DD)
         return dateTag
     
     def adjust_time_tag(self, timeTag:str) -> str:
-        print(f"TimeTag at start: {timeTag}")
-        tagOut = timeTag.replace("hh", self.attributes["hh"])
-        tagOut = tagOut.replace("mm", self.attributes["mm"])
-        tagOut = tagOut.replace("ss", self.attributes["ss"])
-        #Debug
-        #DEBUG print("TimeTag Function:")
-        #DEBUG print(f"Name: {self.attributes['name_old']}, TimeTag: {tagOut}")
-        #DEBUG print(f"hh: {self.attributes['hh']} - mm: {self.attributes['mm']} - ss: {self.attributes['ss']}")
+        dt = self.get_date_time()
+        tagOut = timeTag.replace("hh", dt.hh)
+        tagOut = tagOut.replace("mm", dt.mm)
+        tagOut = tagOut.replace("ss", dt.ss)
         return tagOut
     
     def adjust_iterator_tag(self, iteratorTag:str) -> str:
-        digits = max(len(iteratorTag), len(str(self.attributes["id"]))) # iterator tag needs enough digits for maximum id value
-        tagOut = str(self.attributes['id']).zfill(digits)
+        digits = max(len(iteratorTag), len(str(self._id))) # iterator tag needs enough digits for maximum id value
+        tagOut = str(self._id).zfill(digits)
         return tagOut
     
     def get_file_type(self) -> str:
-        return self.attributes['file_type']
+        return self._fileType
+
+    def get_path(self) -> Path:
+        return Path(self._path)
+
+    def get_name(self) -> str:
+        return os.path.basename(self._path)
+
+    def get_model(self) -> str:
+        return self._model
+
+    def get_gps(self) -> dict:
+        return self._gps or dict()
+
+    def get_stat(self) -> FileStat:
+    # the parts of the stat data that are still needed after extraction (registry key and time fallback)
+        return FileStat(self._size, self._mtimeNs, self._mtimeNs / 1000000000, self._birthtime)
+
+    def get_timestamp(self) -> int:
+        return self._timestamp
+
+    def get_batch_row(self) -> tuple:
+    # (path, timestamp, sub second, size, model, file type), one row of a BatchTable (see batchtable.py)
+        return (self._path, self._timestamp, self._subSec, self._size, self._model, self._fileType)
+
+    def get_date_time(self) -> DateTimeStrTpl:
+        fields = self.get_fields()
+        YYYY, MM, DD, hh, mm, ss = (fields[key] for key in ("YYYY", "MM", "DD", "hh", "mm", "ss"))
+        return DateTimeStrTpl(f"{YYYY}:{MM}:{DD}", f"{hh}:{mm}:{ss}", YYYY, MM, DD, hh, mm, ss)
+
+    def get_sort_record(self, scope:str, key) -> ordering.SortRecord:
+        scopeKey = ordering.get_scope_key(scope, self._timestamp, os.path.dirname(self._path), self._model)
+        return ordering.SortRecord(scopeKey, self._timestamp, self._subSec, self.get_name(), key)
     
     def generate_name(self, app:object) -> str:
-        # app object must be of class App from main.py
-        tagDictList = app.tagDictList
-        outputName = str()
-        tagList = []
-        for tag in tagDictList:
-            position = int(tag["index"])
-            tempTagText = tag['text'] #need to write to new variable to avoid overwriting
-            match tag["category"]:
-                case app._categoryDate: #Date
-                    tempTagText = self.adjust_date_tag(tempTagText)
-                case app._categoryTime: #Time
-                    tempTagText = self.adjust_time_tag(tempTagText)
-                case app._categoryIterator: #Iterator
-                    tempTagText = self.adjust_iterator_tag(tempTagText)
-                case app._categoryTag: #Custom/Generic Tag
-                    pass
-                case _:
-                    raise ValueError(f"Unknown tag category: {tempTagText}")
-            tagList.insert(position, tempTagText)
-        
-        outputName = util.concat_strings(tagList, app.defaultSeparator)
-        outputName= outputName + self.get_file_type() # add file suffix back in
-        return outputName
+        # app object must be of class App from main.py (or RenameEngine from renamer.py)
+        # for many photos, compile a NameTemplate once and use render/render_many instead
+        return NameTemplate(app.tagDictList, app.defaultSeparator, app).render(self)
     
     def setName(self, newName:str):
-    # Updates all necessary attributes in case of a name change
-        self.attributes['name_old'] = self.attributes['name']
-        self.attributes['name'] = newName
-        self.attributes['name_new'] = newName
-        self.attributes['path_old'] = self.attributes['path']
-        self.attributes['path'] = self.attributes['path'].with_name(newName)
-        self.attributes['path_new'] = self.attributes['path']
-        self.attributes['was_renamed'] = True
-
-    def set_iterator_id(self, dateIdDict:defaultdict):
-        # In the dictionary of all dates, pop the first id values for an entry matching the date_time of the photo
-        self.attributes["id"] = dateIdDict[self.attributes["date_time"]].pop(0)
-        
+    # Updates the path in case of a name change
+        self.set_path(os.path.join(os.path.dirname(self._path), newName))
 
-        
-        
\ No newline at end of file
+    def set_path(self, newPath):
+    # Updates the path after the photo was moved (or renamed)
+        self._pathOld = self._path
+        self._path = str(Path(newPath))
+        self._fileType = sys.intern(os.path.splitext(self._path)[1])
+
+    def set_iterator_id(self, iteratorId:int):
+        self._id = iteratorId
+
+
+@functools.lru_cache(maxsize=4096)
+def get_day(days:int) -> tuple:
+# (YYYY, MM, DD) strings of a day number, photos of a batch share few days
+    day = date.fromordinal(epochOrdinal + days)
+    return f"{day.year:04d}", twoDigits[day.month], twoDigits[day.day]
+
+
+class PhotoRegistry:
+# Keeps Photo objects keyed by (path, size, mtime_ns), so every file is only parsed once per session.
+# A file that changed on disk gets a new key, which replaces the outdated entry on the next lookup.
+# Safe to use from several threads (see extraction.py).
+    def __init__(self, maxSize:int = Settings.photoRegistrySize, index = None):
+        self.maxSize = maxSize
+        self.index = index # optional ExifIndex that is checked before a file gets opened
+        self._photos = OrderedDict() # key -> Photo, ordered from least to most recently used
+        self._keys = dict() # path -> current key
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._photos)
+
+    @staticmethod
+    def get_key(filepath, stat:os.stat_result = None) -> tuple:
+        path = os.path.abspath(filepath)
+        if stat is None:
+            stat = os.stat(path)
+        return (path, stat.st_size, stat.st_mtime_ns)
+
+    def get_photo(self, filepath, stat:os.stat_result = None) -> Photo:
+        try:
+            if stat is None:
+                stat = os.stat(filepath)
+        except OSError:
+            return Photo(filepath) # let Photo raise its usual error for invalid paths
+
+        photo = self.get_cached(filepath, stat)
+        if photo is None:
+            photo = self.add_photo(filepath, stat, get_photo_metadata(filepath, stat))
+        return photo
+
+    def get_cached(self, filepath, stat:os.stat_result) -> Photo:
+    # returns the cached Photo (or builds one from the ExifIndex) without opening the file, None if neither has it
+        key = self.get_key(filepath, stat)
+        with self._lock:
+            photo = self._photos.get(key)
+            if photo is not None:
+                self._photos.move_to_end(key)
+                instrumentation.count("registry.hit")
+                return photo
+        instrumentation.count("registry.miss")
+
+        if self.index is not None:
+            metadata = self.index.get(filepath, stat)
+            if metadata is not None:
+                return self._register(key, Photo(filepath, metadata))
+        return None
+
+    def add_photo(self, filepath, stat:os.stat_result, metadata:PhotoMetadata) -> Photo:
+    # registers freshly extracted metadata and remembers it in the index
+        if self.index is not None:
+            self.index.put(filepath, metadata)
+        return self._register(self.get_key(filepath, stat), Photo(filepath, metadata))
+
+    def _register(self, key:tuple, photo:Photo) -> Photo:
+        with self._lock:
+            self._add(key, photo)
+        return photo
+
+    def _add(self, key:tuple, photo:Photo):
+        self._discard(key[0]) # file changed on disk or another file was renamed to its path, drop what is left of the old one
+        self._photos[key] = photo
+        self._keys[key[0]] = key
+        while len(self._photos) > self.maxSize: # evict least recently used
+            oldKey, _ = self._photos.popitem(last=False)
+            del self._keys[oldKey[0]]
+
+    def _discard(self, path:str):
+        key = self._keys.pop(path, None)
+        if key is not None:
+            del self._photos[key]
+
+    def discard(self, filepath):
+        with self._lock:
+            self._discard(os.path.abspath(filepath))
+
+    def rename(self, pathOld, pathNew):
+    # keeps a photo cached after it was renamed on disk (renaming does not change size or mtime)
+        with self._lock:
+            key = self._keys.pop(os.path.abspath(pathOld), None)
+            if key is not None:
+                photo = self._photos.pop(key)
+                self._add((os.path.abspath(pathNew),) + key[1:], photo)
+        if self.index is not None:
+            self.index.rename(pathOld, pathNew)
+
+    def clear(self):
+        with self._lock:
+            self._photos.clear()
+            self._keys.clear()
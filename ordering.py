@@ -0,0 +1,55 @@
+import calendar
+from collections import namedtuple
+
+# Iterator ids: every photo gets one sort record (timestamp parsed to an integer once),
+# all records are sorted a single time and ids are handed out in one pass.
+
+scopeGlobal = "global" # one numbering for the whole batch
+scopeDay = "day" # numbering restarts every day
+scopeDirectory = "directory" # numbering restarts in every directory
+scopeModel = "model" # numbering per camera model
+numberingScopes = (scopeGlobal, scopeDay, scopeDirectory, scopeModel)
+
+secondsPerDay = 86400
+
+# scope first, then time, then the deterministic tie-breaks
+SortRecord = namedtuple("SortRecord", ["scope", "timestamp", "subSec", "name", "key"])
+
+
+def get_timestamp(YYYY:str, MM:str, DD:str, hh:str, mm:str, ss:str) -> int:
+# seconds since 1970 of the (time zone less) EXIF date and time
+    return calendar.timegm((int(YYYY), int(MM), int(DD), int(hh), int(mm), int(ss)))
+
+
+def get_sub_sec(subSec:str) -> int:
+# "25" -> 250000 microseconds, so fractions with a different number of digits compare correctly
+    return int(subSec[:6].ljust(6, "0")) if subSec else 0
+
+
+def get_scope_key(scope:str, timestamp:int, directory:str, model:str):
+    match scope:
+        case "global":
+            return 0
+        case "day":
+            return timestamp // secondsPerDay
+        case "directory":
+            return directory
+        case "model":
+            return model or ""
+        case _:
+            raise ValueError(f"Invalid numbering scope: {scope}. Needs to be one of {', '.join(numberingScopes)}")
+
+
+def get_iterator_ids(records:list, start:int = 1) -> tuple[dict, int]:
+# returns record key -> id and the number of digits the largest id needs
+    iteratorIds = dict()
+    currentScope = object() # never equal to a real scope
+    maxId = 0
+    for record in sorted(records): # ties are broken by sub second, then name, then key
+        if record.scope != currentScope:
+            currentScope = record.scope
+            counter = start
+        iteratorIds[record.key] = counter
+        maxId = max(maxId, counter)
+        counter += 1
+    return iteratorIds, len(str(maxId))
@@ -0,0 +1,155 @@
+import os
+import sys
+from collections import defaultdict
+
+import formats
+import instrumentation
+from dedupe import DuplicateGroup
+from scanner import scan_directory, split_entry
+from settings import Settings
+
+# Near duplicates (burst shots, re-exports) by perceptual hash: every image is reduced to a difference hash (dHash)
+# of hashSize x hashSize bits, images whose hashes differ in at most maxDistance bits are grouped.
+# JPEGs are decoded at reduced size with Image.draft (DCT scaling), so the full resolution is never decoded.
+# Hashes go into a BK-tree, so each image is only compared with the few hashes near it instead of all others,
+# and matches are merged into groups with union-find (a ~ b and b ~ c puts a, b and c in one group).
+# usage: python perceptual.py <directory> [...] (prints the groups, nothing is changed)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: python perceptual.py <directory> [...]")
+        return
+    finder = SimilarityFinder()
+    groups = finder.find([entry for directory in sys.argv[1:] for entry in scan_directory(directory)])
+    for group in groups:
+        print(group.original)
+        for similar in group.duplicates:
+            print(f"  ~ {similar}")
+    print(f"{sum(len(group.duplicates) for group in groups)} near duplicates of {len(groups)} files")
+
+
+def get_dhash(filepath, hashSize:int = Settings.perceptualHashSize) -> int:
+# difference hash: one bit per neighbouring pixel pair of a (hashSize + 1) x hashSize grayscale thumbnail
+    from PIL import Image
+
+    with formats.open_image(filepath) as image:
+        image.draft("L", (hashSize + 1, hashSize)) # JPEG only: decodes at 1/2, 1/4 or 1/8 of the size, still larger than asked
+        pixels = image.convert("L").resize((hashSize + 1, hashSize), Image.Resampling.BOX).tobytes()
+
+    value = 0
+    for row in range(0, len(pixels), hashSize + 1):
+        for column in range(row, row + hashSize):
+            value = value << 1 | (pixels[column] < pixels[column + 1])
+    return value
+
+
+def get_distance(hashA:int, hashB:int) -> int:
+# number of differing bits (Hamming distance)
+    return (hashA ^ hashB).bit_count()
+
+
+class BKTree:
+# Burkhard-Keller tree of hashes: every child is keyed by its distance to the parent, so the triangle
+# inequality rules out whole subtrees during a search. Nodes are [hash, items, children].
+    def __init__(self):
+        self._root = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, value:int, item):
+        self._size += 1
+        if self._root is None:
+            self._root = [value, [item], dict()]
+            return
+        node = self._root
+        while True:
+            distance = get_distance(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], dict()]
+                return
+            node = child
+
+    def search(self, value:int, maxDistance:int) -> list:
+    # (distance, item) of every item whose hash is at most maxDistance bits away
+        results = []
+        pending = [self._root] if self._root is not None else []
+        while pending:
+            node = pending.pop()
+            distance = get_distance(value, node[0])
+            if distance <= maxDistance:
+                results.extend((distance, item) for item in node[1])
+            for childDistance, child in node[2].items():
+                if distance - maxDistance <= childDistance <= distance + maxDistance:
+                    pending.append(child)
+        return results
+
+
+class SimilarityFinder:
+    def __init__(self, maxDistance:int = Settings.perceptualDistance, hashSize:int = Settings.perceptualHashSize):
+        self.maxDistance = maxDistance
+        self.hashSize = hashSize
+        self.errors = [] # (path, error) of the files that could not be decoded in the last search
+        self._hashes = dict() # (path, size, mtime_ns) -> hash
+
+    def find(self, entries) -> list:
+    # entries can be paths or ScanEntry items, returns a DuplicateGroup (see dedupe.py) for every set of similar images
+        self.errors = []
+        filepaths = []
+        tree = BKTree()
+        parents = [] # union-find forest over the positions in filepaths
+
+        with instrumentation.timer("similar.find"):
+            for item in entries:
+                filepath, stat = split_entry(item)
+                try:
+                    value = self.get_hash(filepath, stat)
+                except Exception as error: # anything PIL can't decode is left out
+                    self.errors.append((filepath, error))
+                    continue
+                position = len(filepaths)
+                filepaths.append(filepath)
+                parents.append(position)
+                for _, other in tree.search(value, self.maxDistance): # each pair is found once, by the later file
+                    union(parents, position, other)
+                tree.add(value, position)
+
+        members = defaultdict(list)
+        for position in range(len(filepaths)):
+            members[find_root(parents, position)].append(filepaths[position])
+        return [DuplicateGroup(group[0], group[1:]) for group in members.values() if len(group) > 1]
+
+    def get_hash(self, filepath, stat:os.stat_result = None) -> int:
+        if stat is None:
+            stat = os.stat(filepath)
+        key = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+        value = self._hashes.get(key)
+        if value is None:
+            instrumentation.count("similar.hash")
+            with instrumentation.timer("similar.decode"):
+                value = self._hashes[key] = get_dhash(filepath, self.hashSize)
+        return value
+
+
+def find_root(parents:list, position:int) -> int:
+    while parents[position] != position:
+        parents[position] = parents[parents[position]] # path halving keeps the trees flat
+        position = parents[position]
+    return position
+
+
+def union(parents:list, positionA:int, positionB:int):
+# the earlier file becomes the root, so groups list their files in the order they were given
+    rootA, rootB = find_root(parents, positionA), find_root(parents, positionB)
+    if rootA != rootB:
+        parents[max(rootA, rootB)] = min(rootA, rootB)
+
+
+if __name__ == "__main__":
+    main()
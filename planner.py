@@ -0,0 +1,151 @@
+import os
+from collections import namedtuple
+from pathlib import Path
+
+import instrumentation
+from utilities import DirectoryCache, DirectoryNameIndex, rename_no_replace
+
+# Builds the complete old -> new mapping of a batch before anything is renamed on disk.
+# Collisions (with existing files and within the batch) get a deterministic duplicate suffix,
+# chains (A -> B, B -> C) are ordered and cycles (A -> B, B -> A) go through a temporary name.
+# New paths can be in other directories (folder sorting), missing target directories are created when the plan runs
+# and the chains are executed grouped by target directory.
+
+RenameStep = namedtuple("RenameStep", ["source", "target"])
+
+tempSuffix = ".sortmapicture-tmp"
+
+
+def get_key(path) -> str:
+# names are compared the way the file system does (case insensitive on Windows)
+    return os.path.normcase(os.path.abspath(path))
+
+
+class RenamePlan:
+    def __init__(self, renames:list):
+        # renames: list of (old path, wanted new path) in the order duplicate suffixes should be assigned
+        self.renames = [] # (old path, final new path)
+        self.steps = [] # RenameStep in execution order
+        self.suffixed = [] # (old path, wanted new path, final new path) for every resolved collision
+        self.cycles = 0
+        self.groups = [] # (first step index, rename indices) of every chain, execution can only stop between them
+        self.stopped = False # True if execute() was stopped before the last step
+        self._nameIndexes = dict() # directory key -> DirectoryNameIndex
+        self._directories = DirectoryCache()
+        self._tempKeys = set() # temporary names of cycles
+
+        renames = [(Path(old), Path(new)) for old, new in renames]
+        unchanged = {get_key(old) for old, new in renames if old == new}
+        for old, new in renames: # files renamed in this batch will vacate their name
+            if get_key(old) not in unchanged:
+                self.get_name_index(old.parent).discard(old.name)
+
+        for old, new in renames:
+            if get_key(old) in unchanged:
+                continue
+            target = new.with_name(self.get_name_index(new.parent).claim(new.name))
+            if target != old: # a duplicate suffix can lead back to the current name
+                self.renames.append((old, target))
+                if target != new:
+                    self.suffixed.append((old, new, target))
+        self._order_steps()
+        instrumentation.count("plan.collisions", len(self.suffixed))
+        instrumentation.count("plan.cycles", self.cycles)
+
+    def __len__(self):
+        return len(self.renames)
+
+    def get_name_index(self, directory:Path) -> DirectoryNameIndex:
+    # every directory is only listed once
+        dirKey = get_key(directory)
+        if dirKey not in self._nameIndexes:
+            self._nameIndexes[dirKey] = DirectoryNameIndex(directory)
+        return self._nameIndexes[dirKey]
+
+    def _get_temp_path(self, path:Path) -> Path:
+        tempPath = path.with_name(self.get_name_index(path.parent).claim(path.name + tempSuffix))
+        self._tempKeys.add(get_key(tempPath))
+        return tempPath
+
+    def _order_steps(self):
+    # a rename has to wait until its target was vacated by the rename of another file in the batch
+        targets = {get_key(old): (old, new, renameIndex) for renameIndex, (old, new) in enumerate(self.renames)}
+        done = dict() # source key -> index of the unit its chain belongs to
+        units = [] # lists of (steps, rename indices), a chain that needs a name vacated by an earlier chain joins its unit
+        for old, new in self.renames:
+            chain = []
+            inChain = set()
+            node = get_key(old)
+            while node in targets and node not in done and node not in inChain:
+                chain.append(node)
+                inChain.add(node)
+                node = get_key(targets[node][1])
+            if not chain:
+                continue
+
+            steps = []
+            sources = {key: targets[key][0] for key in chain}
+            if node in inChain: # cycle, free up one name first
+                tempPath = self._get_temp_path(sources[node])
+                steps.append(RenameStep(sources[node], tempPath))
+                sources[node] = tempPath
+                self.cycles += 1
+
+            unit = done[node] if node in done else len(units) # the chain ends at a name an earlier chain vacates
+            if unit == len(units):
+                units.append([])
+            for key in reversed(chain):
+                steps.append(RenameStep(sources[key], targets[key][1]))
+                done[key] = unit
+            units[unit].append((steps, [targets[key][2] for key in chain]))
+
+        # units don't depend on each other, so the ones that end in the same directory can run together
+        units.sort(key=lambda unit: get_key(unit[0][0][-1].target.parent))
+        for unit in units:
+            for steps, renameIndices in unit:
+                self.groups.append((len(self.steps), renameIndices))
+                self.steps.extend(steps)
+
+    def execute(self, onStep=None, shouldStop=None) -> list:
+    # runs the plan, every step is a single rename call unless another process took a target name in the meantime
+    # onStep(index, step) is called after every completed step with the paths actually used
+    # shouldStop() is checked before every chain, so a stopped plan never leaves a file at a temporary name
+        groupStarts = {firstStep: position for position, (firstStep, renameIndices) in enumerate(self.groups)}
+        completedGroups = 0 # groups before the current one
+        moved = dict() # planned target key -> path actually used
+        tempMoved = dict() # the same for temporary names, the only targets a later step renames again
+        for index, step in enumerate(self.steps):
+            if index in groupStarts:
+                completedGroups = groupStarts[index]
+                if shouldStop is not None and shouldStop():
+                    self.stopped = True
+                    break
+            source = tempMoved.get(get_key(step.source), step.source) # a temporary name might have moved as well
+            target = step.target
+            self._directories.ensure(target.parent)
+            while True:
+                try:
+                    rename_no_replace(source, target)
+                    break
+                except FileExistsError:
+                    instrumentation.count("rename.collision_retry")
+                    target = target.with_name(self.get_name_index(target.parent).claim(step.target.name))
+            if target != step.target:
+                (tempMoved if get_key(step.target) in self._tempKeys else moved)[get_key(step.target)] = target
+            if onStep is not None:
+                onStep(index, RenameStep(source, target))
+
+        if self.stopped:
+            completed = {renameIndex for firstStep, renameIndices in self.groups[:completedGroups] for renameIndex in renameIndices}
+            self.renames = [rename for renameIndex, rename in enumerate(self.renames) if renameIndex in completed]
+        if moved:
+            self.renames = [(old, moved.get(get_key(new), new)) for old, new in self.renames]
+        return self.renames
+
+    def print_plan(self):
+        for old, new in self.renames:
+            print(f"{old} -> {new}")
+        for old, wanted, target in self.suffixed:
+            print(f"Collision: {old} would be {wanted.name}, using {target.name}")
+        if self.cycles:
+            print(f"Resolved {self.cycles} rename cycles")
@@ -0,0 +1,282 @@
+import importlib.util
+import os
+import threading
+from pathlib import Path
+
+import instrumentation
+import ordering
+import utilities as util
+from dedupe import DuplicateFinder, duplicateModes
+from extraction import extract_photos
+from journal import RenameJournal
+from mapicture import Photo, PhotoRegistry
+from perceptual import SimilarityFinder
+from planner import RenamePlan
+from scanner import ScanEntry, split_entry
+from settings import Settings
+from template import DirectoryTemplate, NameTemplate
+
+# GUI-free rename engine, used by the App window (main.py) and the command line (cli.py)
+
+# these strings are used to categorize individual tags and treat them differently
+categoryDate = "date"
+categoryTime = "time"
+categoryIterator = "iterator"
+categoryTag = "customTag"
+categoryFile = "filepath"
+protectedTags = (categoryTime, categoryDate, categoryIterator) # these will be protected from removal
+
+separators = ["", "-", "_"]
+dateComponents = ["YYYY", "MM", "DD"]
+timeComponents = ["hh", "mm", "ss"]
+iteratorComponents = "##"
+
+
+class RenameEngine:
+    def __init__(self, registry:PhotoRegistry = None, separator:str = "_", journal:RenameJournal = None,
+                 iteratorScope:str = Settings.iteratorScope, batchTable:bool = Settings.batchTable,
+                 duplicateMode:str = Settings.duplicateMode, similarMode:str = Settings.similarMode,
+                 folderTemplate:str = Settings.folderTemplate, folderRoot = Settings.folderRoot):
+        # same attribute names as App, Photo.generate_name works with either
+        self._categoryDate = categoryDate
+        self._categoryTime = categoryTime
+        self._categoryIterator = categoryIterator
+        self._categoryTag = categoryTag
+        self.defaultSeparator = separator
+        self.tagDictList = []
+        self.iteratorScope = iteratorScope
+        self.iteratorIds = dict() # path -> iterator id
+        self.iteratorDigits = 1
+        self.useBatchTable = batchTable and importlib.util.find_spec("numpy") is not None # see batchtable.py
+        self._batch = None # (BatchTable, iterator ids, photos) of the last read batch, until its names are planned
+        self.photoRegistry = registry if registry is not None else PhotoRegistry()
+        for mode in (duplicateMode, similarMode):
+            if mode not in duplicateModes:
+                raise ValueError(f"Invalid duplicate mode: {mode}. Needs to be one of {', '.join(duplicateModes)}")
+        self.duplicateMode = duplicateMode
+        self.duplicateFinder = DuplicateFinder(index=self.photoRegistry.index)
+        self.duplicates = [] # DuplicateGroup of every file with exact copies in the last run (unless duplicateMode is "keep")
+        self.similarMode = similarMode
+        self.similarityFinder = SimilarityFinder()
+        self.similarGroups = [] # DuplicateGroup of every set of near duplicates in the last run (unless similarMode is "keep")
+        self.directoryTemplate = DirectoryTemplate(folderTemplate) if folderTemplate else None # None renames in place
+        self.folderRoot = folderRoot
+        self._plannedPhotos = dict()
+        self.journal = journal # optional RenameJournal, makes runs recoverable and undoable
+        self.errors = [] # (path, error) of the files skipped in the last run
+        self.onProgress = None # optional callback(stage, done) for every read file and every rename step
+        self.cancelEvent = threading.Event() # set from another thread to stop the run at the next safe point
+
+    def cancel(self):
+        self.cancelEvent.set()
+
+    def report_progress(self, stage:str, done:int):
+        if self.onProgress is not None:
+            self.onProgress(stage, done)
+
+    def get_photo_generator(self, filepaths, stage:str = None):
+    # stops early once the run is cancelled, progress is only reported if a stage is given
+        for done, result in enumerate(extract_photos(filepaths, self.photoRegistry), 1):
+            if self.cancelEvent.is_set():
+                return
+            if stage is not None:
+                self.report_progress(stage, done)
+            if result.error is not None:
+                print(f"Skipping {result.path}: {result.error}")
+                self.errors.append((result.path, result.error))
+                continue
+            yield result.photo
+
+    def get_iterator_ids(self, filepaths) -> list:
+    # filepaths can be any iterable (e.g. a running scan), returns the readable files as a list of ScanEntry
+        entries = []
+        records = []
+        photos = []
+        self.errors = []
+        for photo in self.get_photo_generator(filepaths, "reading"):
+            path = str(photo.get_path())
+            entries.append(ScanEntry(path, photo.get_stat()))
+            if self.useBatchTable:
+                photos.append(photo)
+            else:
+                records.append(photo.get_sort_record(self.iteratorScope, path))
+
+        with instrumentation.timer("plan.iterator_ids"):
+            if self.useBatchTable:
+                self.iteratorIds, self.iteratorDigits = self.get_batch_iterator_ids(photos)
+            else:
+                self.iteratorIds, self.iteratorDigits = ordering.get_iterator_ids(records)
+        return entries
+
+    def get_batch_iterator_ids(self, photos:list) -> tuple[dict, int]:
+    # same result as ordering.get_iterator_ids, computed on a BatchTable that is kept to name the photos afterwards
+        from batchtable import BatchTable # NumPy takes a while to import, only load it once a batch needs it
+        table = BatchTable.from_photos(photos)
+        ids, digits = table.get_iterator_ids(self.iteratorScope)
+        self._batch = (table, ids, photos)
+        return dict(zip(table.paths, ids.tolist())), digits
+
+    def handle_duplicates(self, filepaths) -> list:
+    # reports exact and then near duplicates before anything is read or planned
+    # a group is only known once every file was seen, so this collects the whole scan first:
+    # with a duplicate mode on, scanning no longer overlaps with reading the metadata
+        entries = list(filepaths)
+        if self.duplicateMode != "keep":
+            self.duplicates, entries = self.check_groups(self.duplicateFinder, entries, self.duplicateMode, "dedupe", "Duplicates of")
+        if self.similarMode != "keep":
+            self.similarGroups, entries = self.check_groups(self.similarityFinder, entries, self.similarMode, "similar", "Similar to")
+        return entries
+
+    def check_groups(self, finder, entries:list, mode:str, stage:str, label:str) -> tuple:
+    # finder is a DuplicateFinder or SimilarityFinder, with "skip" only the first file of each group is kept
+        with instrumentation.timer(f"plan.{stage}"):
+            groups = finder.find(entries)
+        for filepath, error in finder.errors:
+            print(f"Cannot compare {filepath}: {error}")
+        for group in groups:
+            print(f"{label} {group.original}: {', '.join(str(duplicate) for duplicate in group.duplicates)}")
+        if mode != "skip":
+            return groups, entries
+
+        skipped = {os.path.abspath(duplicate) for group in groups for duplicate in group.duplicates}
+        instrumentation.count(f"{stage}.skipped", len(skipped))
+        return groups, [entry for entry in entries if os.path.abspath(split_entry(entry)[0]) not in skipped]
+
+    def get_new_path(self, pathOld:Path, name:str, folder:str = None) -> Path:
+    # folder is the rendered DirectoryTemplate (None renames in place), relative to folderRoot or the current directory
+        if folder is None:
+            return pathOld.with_name(name)
+        if self.folderRoot is not None:
+            return Path(self.folderRoot) / folder / name
+        folders = Path(folder).parts
+        parent = pathOld.parent
+        if len(parent.parts) > len(folders) and parent.parts[-len(folders):] == folders: # already sorted, don't nest it again
+            return parent / name
+        return parent / folder / name
+
+    def get_sized_tags(self, tagDictList:list) -> list:
+    # copy of the tags with iterator tags wide enough for the largest id, so all names line up
+        sizedTags = []
+        for tag in tagDictList:
+            if tag["category"] == self._categoryIterator:
+                tag = dict(tag, text="#" * max(len(tag["text"]), self.iteratorDigits))
+            sizedTags.append(tag)
+        return sizedTags
+
+    def generate_name(self, photo:Photo, tagDictList:list) -> str:
+        self.tagDictList = tagDictList
+        return photo.generate_name(self)
+
+    @instrumentation.timed("plan.total")
+    def plan_renames(self, filepaths, tagDictList:list) -> RenamePlan:
+    # computes every new name in memory, nothing is renamed yet (doubles as dry run)
+        if self.duplicateMode != "keep" or self.similarMode != "keep":
+            filepaths = self.handle_duplicates(filepaths) # needs every file before the first one is read
+        with instrumentation.timer("plan.read_metadata"):
+            entries = self.get_iterator_ids(filepaths) # filepaths might be a generator, so only iterate it once
+        self.tagDictList = self.get_sized_tags(tagDictList)
+
+        template = NameTemplate(self.tagDictList, self.defaultSeparator, self) # compiled once per run
+
+        if self._batch is not None:
+            renames = self.plan_batch_names(template)
+            with instrumentation.timer("plan.resolve"):
+                return RenamePlan(renames)
+
+        renames = []
+        self._plannedPhotos = dict() # old path -> Photo, to update the photos after executing the plan
+        for photo in self.get_photo_generator(entries):
+            pathOld = photo.get_path()
+            photo.set_iterator_id(self.iteratorIds[str(pathOld)])
+            with instrumentation.timer("name.render"):
+                folder = self.directoryTemplate.render(photo) if self.directoryTemplate is not None else None
+                renames.append((pathOld, self.get_new_path(pathOld, template.render(photo), folder)))
+            self._plannedPhotos[pathOld] = photo
+        with instrumentation.timer("plan.resolve"):
+            return RenamePlan(renames)
+
+    def plan_batch_names(self, template:NameTemplate) -> list:
+    # names all photos of the batch read by get_iterator_ids at once, without going through the registry again
+        table, ids, photos = self._batch
+        self._batch = None
+        with instrumentation.timer("name.render_batch"):
+            names = table.render_names(template, ids)
+            if self.directoryTemplate is not None:
+                folders = table.render_names(self.directoryTemplate, ids)
+            else:
+                folders = [None] * len(names)
+
+        renames = []
+        self._plannedPhotos = dict()
+        for photo, iteratorId, name, folder in zip(photos, ids.tolist(), names, folders):
+            pathOld = photo.get_path()
+            photo.set_iterator_id(iteratorId)
+            renames.append((pathOld, self.get_new_path(pathOld, name, folder)))
+            self._plannedPhotos[pathOld] = photo
+        return renames
+
+    @instrumentation.timed("rename.execute")
+    def execute_plan(self, plan:RenamePlan) -> list:
+    # a cancelled run stops between two chains of the plan, the returned list only has the completed renames
+        executed = [] # steps in the order they ran, chains and cycles only work out in that order
+        runId = self.journal.begin_run(plan.steps) if self.journal is not None else None
+        def onStep(index, step):
+            executed.append(step)
+            if runId is not None:
+                self.journal.step_done(runId, index, *step)
+            self.report_progress("renaming", index + 1)
+        try:
+            renamed = plan.execute(onStep, self.cancelEvent.is_set)
+        except BaseException:
+            if runId is not None:
+                self.journal.commit() # everything up to here is done, the rest is left to recover()
+            raise
+        if runId is not None:
+            self.journal.end_run(runId, "cancelled" if plan.stopped else "completed")
+
+        for pathOld, pathNew in renamed:
+            self._plannedPhotos[pathOld].set_path(pathNew)
+        for source, target in executed:
+            self.photoRegistry.rename(source, target)
+
+        if self.photoRegistry.index is not None:
+            self.photoRegistry.index.flush()
+        return renamed
+
+    def rename_all_files(self, filepaths, tagDictList:list, dryRun:bool = False) -> list:
+    # renames all files according to the tags, returns a list of (old path, new path)
+    # with dryRun nothing is renamed on disk and the photos keep their names
+        plan = self.plan_renames(filepaths, tagDictList)
+        if dryRun:
+            return plan.renames
+        return self.execute_plan(plan)
+
+
+def get_tag_dict_list(tags:list) -> list:
+# builds the tag list (as used by App.get_all_tags) from plain tag strings, e.g. ["YYYY-MM-DD", "hhmmss", "##", "holiday"]
+    tagDictList = []
+    for index, text in enumerate(tags):
+        tagDictList.append({"index": index, "text": text, "category": get_tag_category(text)})
+    return tagDictList
+
+
+def get_tag_category(text:str) -> str:
+    if text and set(text) == {"#"}:
+        return categoryIterator
+    if is_component_tag(text, dateComponents):
+        return categoryDate
+    if is_component_tag(text, timeComponents):
+        return categoryTime
+
+    result = util.is_valid_file_tag(text)
+    if not result[0]:
+        raise ValueError(result[1])
+    return categoryTag
+
+
+def is_component_tag(text:str, components:list) -> bool:
+# True if the text only consists of the given components and separators (at least one component)
+    remainder = text
+    for component in components:
+        remainder = remainder.replace(component, "")
+    return remainder != text and all(char in separators for char in remainder)
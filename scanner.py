@@ -0,0 +1,71 @@
+import os
+from collections import namedtuple
+from fnmatch import fnmatch
+
+from mapicture import supportedFormats
+from utilities import get_pictures_dir
+
+# stat is taken from the DirEntry, so later stages don't need to stat the file again
+ScanEntry = namedtuple("ScanEntry", ["path", "stat"])
+
+
+def main():
+    count = 0
+    for entry in scan_directory(get_pictures_dir()):
+        print(entry.path)
+        count += 1
+    print(f"Found {count} supported files")
+
+
+def scan_directory(root, recursive:bool = True, maxDepth:int = None, include:list = None, exclude:list = None,
+                   formats:set = supportedFormats):
+# Lazily yields a ScanEntry for every supported file below root, directories are read one at a time.
+# include/exclude are glob patterns matched against the file/directory name and the path relative to root.
+# maxDepth=0 only scans root itself, None has no limit.
+    root = os.fspath(root)
+    pending = [(root, 0)] # directories still to scan, used as a stack to avoid recursion limits
+    while pending:
+        directory, depth = pending.pop()
+        try:
+            with os.scandir(directory) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name) # deterministic order
+        except OSError as error:
+            print(f"Cannot read directory {directory}: {error}")
+            continue
+
+        subDirectories = []
+        for entry in entries:
+            relativePath = os.path.relpath(entry.path, root)
+            if exclude and matches_any(entry.name, relativePath, exclude):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive and (maxDepth is None or depth < maxDepth):
+                        subDirectories.append((entry.path, depth + 1))
+                    continue
+                if not entry.is_file():
+                    continue
+                if os.path.splitext(entry.name)[1].lower() not in formats:
+                    continue
+                if include and not matches_any(entry.name, relativePath, include):
+                    continue
+                yield ScanEntry(entry.path, entry.stat())
+            except OSError as error: # file vanished or isn't accessible
+                print(f"Cannot read {entry.path}: {error}")
+
+        pending.extend(reversed(subDirectories)) # keep alphabetical order when popping
+
+
+def split_entry(item) -> tuple:
+# (path, stat) of a ScanEntry or (path, None) of a plain path
+    if isinstance(item, ScanEntry):
+        return item.path, item.stat
+    return item, None
+
+
+def matches_any(name:str, relativePath:str, patterns:list) -> bool:
+    return any(fnmatch(name, pattern) or fnmatch(relativePath, pattern) for pattern in patterns)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,38 @@
+import os
+
+
 class Settings:
-    pass
\ No newline at end of file
+    photoRegistrySize = 50000 # maximum number of Photo objects kept in memory by the PhotoRegistry
+    exifIndexPath = None # path to an SQLite file (see exifindex.py) to remember metadata between sessions, None disables it
+    exifIndexBatchSize = 1000 # number of entries written to the index per transaction
+    extractionWorkers = 4 # number of workers reading metadata in parallel, 1 reads one file after another
+    extractionExecutor = "thread" # "thread" for slow (network/spinning) storage, "process" for decode heavy formats
+    extractionWindow = 64 # maximum number of files being read at the same time, keeps memory flat
+    journalPath = os.path.join(os.path.expanduser("~"), ".sortmapicture", "rename_journal.jsonl") # write-ahead journal of all renames (see journal.py)
+    journalBatchSize = 256 # completed renames per fsync of the journal
+    journalBatchWindow = 1.0 # maximum seconds a completed rename waits for the next fsync
+    journalRecovery = "rollback" # what to do with runs interrupted by a crash: "rollback" or "replay"
+    journalHistorySize = 10 # finished journals kept for undo, the oldest is dropped when the journal is rotated after a run
+    batchTable = True # sort and name whole batches with NumPy arrays if NumPy is installed (see batchtable.py)
+    duplicateMode = "keep" # exact duplicates (see dedupe.py): "keep" renames every copy, "report" lists them first, "skip" only renames the first copy
+    dedupeSampleSize = 65536 # bytes hashed at the start and at the end of a file before it is hashed completely
+    similarMode = "keep" # near duplicates like burst shots (see perceptual.py), same choices as duplicateMode
+    perceptualHashSize = 8 # bits per side of the perceptual hash (8 gives 64 bit hashes)
+    perceptualDistance = 4 # maximum number of differing hash bits for two images to count as near duplicates
+    folderTemplate = None # folder sorting: move photos into folders like "YYYY/MM-DD" (see template.DirectoryTemplate), None renames in place
+    folderRoot = None # directory the folders of folderTemplate are created in, None uses the current directory of every photo
+    iteratorScope = "global" # numbering of iterator tags: "global", "day", "directory" or "model" (see ordering.py)
+    virtualFileList = True # only create widgets for the visible rows of the file list (needed for very large selections)
+    virtualRowHeight = 32 # pixels per row of the virtual file list
+    virtualOverscan = 2 # rows created beyond the visible ones
+    thumbnails = True # show a preview in every row of the virtual file list (see thumbnails.py)
+    thumbnailSize = 48 # pixels, longest side of a preview
+    thumbnailCachePath = os.path.join(os.path.expanduser("~"), ".sortmapicture", "thumbnails") # None keeps previews in memory only
+    thumbnailMemorySize = 512 # previews kept in memory (least recently used are dropped first)
+    thumbnailWorkers = 2 # threads making previews
+    thumbnailPollInterval = 0.05 # seconds between checks of the file list for finished previews
+    progressInterval = 0.2 # seconds between progress updates of a running rename (and between checks of the GUI)
+    renameLogSize = 20 # renames of a GUI run printed to the console, the rest is only counted
+    instrumentation = False # count and time every stage of a run (see instrumentation.py)
+    traceMemory = False # also record the peak memory of a run with tracemalloc (slow)
+    statsPath = None # JSON file the stats of every run are written to, None keeps them in memory only
@@ -0,0 +1,108 @@
+import os
+import re
+from operator import itemgetter
+
+from utilities import is_valid_file_tag
+
+# Filename templates: the tag list is compiled once per run into a single format string
+# plus the list of photo fields it needs (see Photo.get_fields), so naming a photo is one pass over precomputed slots.
+# DirectoryTemplate does the same for the target folders of the folder sorting mode.
+
+dateTokens = re.compile(r"YYYY|MM|DD")
+timeTokens = re.compile(r"hh|mm|ss")
+dateTimeTokens = re.compile(r"YYYY|MM|DD|hh|mm|ss")
+
+
+class NameTemplate:
+    def __init__(self, tagDictList:list, separator:str, app:object):
+        # app needs the _category* attributes of App (main.py) or RenameEngine (renamer.py)
+        self.tagDictList = tagDictList
+        self.separator = separator
+        self._slots = [] # photo fields in the order of the format string
+
+        parts = []
+        for tag in sorted(tagDictList, key=lambda tag: int(tag["index"])):
+            text = tag["text"]
+            match tag["category"]:
+                case app._categoryDate:
+                    parts.append(compile_tokens(text, dateTokens, self._slots))
+                case app._categoryTime:
+                    parts.append(compile_tokens(text, timeTokens, self._slots))
+                case app._categoryIterator:
+                    self._slots.append("id")
+                    parts.append("{:0" + str(max(len(text), 1)) + "d}") # same width as the tag, more if the id needs it
+                case app._categoryTag:
+                    if not parts and text == "": # leading empty tags don't get a separator (like util.concat_strings)
+                        continue
+                    parts.append(escape(text))
+                case _:
+                    raise ValueError(f"Unknown tag category: {text}")
+
+        self._slots.append("file_type") # add file suffix back in
+        self.formatString = escape(separator).join(parts) + "{}"
+        self._format = self.formatString.format
+        self._getValues = get_values_getter(self._slots)
+
+    def render(self, photo) -> str:
+        return self._format(*self._getValues(photo.get_fields()))
+
+    def render_many(self, photos) -> list:
+        render = self.render
+        return [render(photo) for photo in photos]
+
+
+class DirectoryTemplate:
+# Target folder of a photo relative to a root directory, e.g. "YYYY/MM-DD" -> "2023/05-01".
+# Same fields and attributes as NameTemplate, so BatchTable.render_names can render it as well.
+    def __init__(self, pattern:str):
+        self.pattern = pattern
+        self._slots = []
+
+        if re.match(r"[\\/]|[A-Za-z]:", pattern):
+            raise ValueError(f"Invalid folder template: {pattern}. Needs to be relative, the root is given separately")
+        parts = []
+        for folder in re.split(r"[\\/]", pattern):
+            if not folder:
+                continue
+            if folder in (".", ".."):
+                raise ValueError(f"Invalid folder template: {pattern}. Folders may not be '.' or '..'")
+            valid, errorMsg = is_valid_file_tag(dateTimeTokens.sub("", folder))
+            if not valid:
+                raise ValueError(f"Invalid folder template: {pattern}. {errorMsg}")
+            parts.append(compile_tokens(folder, dateTimeTokens, self._slots))
+        if not parts:
+            raise ValueError(f"Invalid folder template: {pattern}. Needs at least one folder")
+
+        self.formatString = escape(os.sep).join(parts)
+        self._format = self.formatString.format
+        self._getValues = get_values_getter(self._slots)
+
+    def render(self, photo) -> str:
+        return self._format(*self._getValues(photo.get_fields()))
+
+
+def compile_tokens(text:str, tokens:re.Pattern, slots:list) -> str:
+# format string of text with a {} for every token, the tokens are added to slots
+    output = []
+    position = 0
+    for match in tokens.finditer(text):
+        output.append(escape(text[position:match.start()]))
+        output.append("{}")
+        slots.append(match.group())
+        position = match.end()
+    output.append(escape(text[position:]))
+    return "".join(output)
+
+
+def get_values_getter(slots:list):
+# function that returns the values of the slots from a fields dict, always as a tuple
+    if not slots:
+        return lambda fields: ()
+    getValues = itemgetter(*slots)
+    if len(slots) == 1: # itemgetter only returns a tuple for several items
+        return lambda fields: (getValues(fields),)
+    return getValues
+
+
+def escape(text:str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
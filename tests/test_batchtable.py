@@ -0,0 +1,84 @@
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent)) # run from anywhere: python -m pytest tests
+
+import ordering  # noqa: E402
+from batchtable import BatchTable  # noqa: E402
+from mapicture import Photo  # noqa: E402
+from renamer import RenameEngine, get_tag_dict_list  # noqa: E402
+from template import DirectoryTemplate, NameTemplate  # noqa: E402
+
+tags = ["YYYY-MM-DD", "hh-mm-ss", "###", "holiday"]
+models = ["Canon EOS R5", "NIKON Z 6", "iPhone 13", None]
+start1960 = -315619200
+
+
+def get_photos(count:int, seed:int = 0) -> list:
+# photos without files in a few directories, many share a timestamp and some share a name, a few are from before 1970
+    rng = random.Random(seed)
+    photos = []
+    for index in range(count):
+        photo = Photo.__new__(Photo)
+        photo._path = f"/photos/{rng.randrange(5)}/IMG_{rng.randrange(count // 2):05d}{rng.choice(['.jpg', '.png'])}"
+        photo._pathOld = None
+        photo._fileType = Path(photo._path).suffix
+        photo._timestamp = start1960 + (rng.randrange(3) if rng.random() < 0.3 else rng.randrange(2000000000))
+        photo._subSec = rng.choice([0, 0, 250000, 500000])
+        photo._model = rng.choice(models)
+        photo._gps = None
+        photo._size = rng.randrange(1000, 9000)
+        photo._mtimeNs = 0
+        photo._birthtime = None
+        photo._id = 0
+        photos.append(photo)
+    return list({photo._path: photo for photo in photos}.values()) # paths are unique within a batch
+
+
+@pytest.mark.parametrize("scope", ordering.numberingScopes)
+def test_ids_and_names_match_per_photo_path(scope):
+    photos = get_photos(2000)
+    engine = RenameEngine()
+    engine.tagDictList = get_tag_dict_list(tags)
+
+    records = [photo.get_sort_record(scope, photo._path) for photo in photos]
+    expectedIds, expectedDigits = ordering.get_iterator_ids(records)
+    table = BatchTable.from_photos(photos)
+    ids, digits = table.get_iterator_ids(scope)
+    assert dict(zip(table.paths, ids.tolist())) == expectedIds
+    assert digits == expectedDigits
+
+    engine.iteratorDigits = digits
+    template = NameTemplate(engine.get_sized_tags(engine.tagDictList), engine.defaultSeparator, engine)
+    for photo in photos:
+        photo.set_iterator_id(expectedIds[photo._path])
+    assert table.render_names(template, ids) == template.render_many(photos)
+
+
+def test_folders_match_directory_template():
+    photos = get_photos(500, seed=1)
+    template = DirectoryTemplate("YYYY/MM-DD")
+    table = BatchTable.from_photos(photos)
+    assert table.render_names(template, np.zeros(len(table), dtype=np.int64)) == [template.render(photo) for photo in photos]
+
+
+def test_count_by_day():
+    photos = get_photos(300, seed=2)
+    days, counts = BatchTable.from_photos(photos).count_by_day()
+    expected = dict()
+    for photo in photos:
+        day = photo.get_timestamp() // ordering.secondsPerDay
+        expected[day] = expected.get(day, 0) + 1
+    assert dict(zip(days.tolist(), counts.tolist())) == expected
+
+
+def test_empty_batch():
+    table = BatchTable.from_photos([])
+    ids, digits = table.get_iterator_ids(ordering.scopeGlobal)
+    assert len(ids) == 0 and digits == 1
+    assert table.get_groups(ordering.scopeDay) == []
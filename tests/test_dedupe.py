@@ -0,0 +1,63 @@
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent)) # run from anywhere: python -m pytest tests
+
+from dedupe import DuplicateFinder  # noqa: E402
+from mapicture import PhotoRegistry  # noqa: E402
+from renamer import RenameEngine, get_tag_dict_list  # noqa: E402
+from scanner import ScanEntry  # noqa: E402
+
+
+def write_files(directory:Path, contents:dict) -> list:
+    paths = []
+    for name, content in contents.items():
+        (directory / name).write_bytes(content)
+        paths.append(str(directory / name))
+    return paths
+
+
+def test_groups_need_the_whole_content(tmp_path):
+    # same size and same head and tail, only the full hash tells b and c apart
+    body = b"x" * 300
+    paths = write_files(tmp_path, {"a": body, "b": b"y" * 100 + b"z" * 100 + b"y" * 100, "c": body, "d": b"short"})
+    finder = DuplicateFinder(sampleSize=100)
+    groups = finder.find(paths)
+
+    assert [(group.original, group.duplicates) for group in groups] == [(paths[0], [paths[2]])]
+    assert not finder.errors
+
+
+def test_file_emptied_after_scan_is_an_error(tmp_path):
+    paths = write_files(tmp_path, {"a": b"x" * 300, "b": b"x" * 300})
+    entries = [ScanEntry(path, os.stat(path)) for path in paths]
+    finder = DuplicateFinder(sampleSize=100)
+    for entry in entries: # samples still match
+        finder.get_sample_hash(*entry)
+    open(paths[1], "wb").close() # truncated before the full hash
+
+    assert finder.find(entries) == []
+    assert [filepath for filepath, _ in finder.errors] == [paths[1]]
+
+
+@pytest.mark.parametrize("mode, renamedNames", [
+    ("skip", ["a.jpg", "c.jpg"]),
+    ("report", ["a.jpg", "b.jpg", "c.jpg"]),
+])
+def test_engine_duplicate_modes(tmp_path, mode, renamedNames):
+    # b is a copy of a, with "skip" only the first copy is renamed
+    for name, color in (("a.jpg", "red"), ("c.jpg", "blue")):
+        exif = Image.Exif()
+        exif[0x0132] = "2023:05:01 12:30:00"
+        Image.new("RGB", (8, 8), color).save(tmp_path / name, exif=exif)
+    shutil.copyfile(tmp_path / "a.jpg", tmp_path / "b.jpg")
+    engine = RenameEngine(PhotoRegistry(), duplicateMode=mode)
+    plan = engine.plan_renames(sorted(tmp_path.iterdir()), get_tag_dict_list(["YYYY-MM-DD", "#"]))
+
+    assert sorted(old.name for old, new in plan.renames) == renamedNames
+    assert [(Path(group.original).name, [Path(path).name for path in group.duplicates]) for group in engine.duplicates] == [("a.jpg", ["b.jpg"])]
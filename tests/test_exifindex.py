@@ -0,0 +1,29 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent)) # run from anywhere: python -m pytest tests
+
+from exifindex import ExifIndex  # noqa: E402
+from fileinfo import DateTimeStrTpl, PhotoMetadata  # noqa: E402
+
+
+def make_metadata(stat:os.stat_result, year:str) -> PhotoMetadata:
+    dateTimeStrTpl = DateTimeStrTpl(f"{year}:01:01", "00:00:00", year, "01", "01", "00", "00", "00")
+    return PhotoMetadata(None, dateTimeStrTpl, stat, None, dict(), "")
+
+
+def test_batched_chain_of_renames(tmp_path):
+    # A -> B, B -> C in one batch: C has to end up with A's entry, not lose it
+    stat = os.stat(tmp_path)
+    with ExifIndex(tmp_path / "index.sqlite") as index:
+        index.put(tmp_path / "A.jpg", make_metadata(stat, "2001"))
+        index.put(tmp_path / "B.jpg", make_metadata(stat, "2002"))
+        index.flush()
+        index.rename(tmp_path / "B.jpg", tmp_path / "C.jpg")
+        index.rename(tmp_path / "A.jpg", tmp_path / "B.jpg")
+        index.flush()
+
+        assert index.get(tmp_path / "A.jpg", stat) is None
+        assert index.get(tmp_path / "B.jpg", stat).dateTimeStrTpl.YYYY == "2001"
+        assert index.get(tmp_path / "C.jpg", stat).dateTimeStrTpl.YYYY == "2002"
@@ -0,0 +1,60 @@
+import sys
+from pathlib import Path
+
+import pytest
+from PIL import Image
+from PIL.TiffImagePlugin import IFDRational
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent)) # run from anywhere: python -m pytest tests
+
+import exifreader  # noqa: E402
+from fileinfo import get_exif_record  # noqa: E402
+
+
+def make_exif() -> Image.Exif:
+    exif = Image.Exif()
+    exif[exifreader.tagDateTime] = "2023:05:01 12:30:05"
+    exif[exifreader.tagModel] = "Canon EOS R5"
+    exifIFD = exif.get_ifd(exifreader.tagExifIFD)
+    exifIFD[exifreader.tagDateTimeOriginal] = "2023:05:01 12:30:04"
+    exifIFD[exifreader.tagSubSecTimeOriginal] = "25"
+    gps = exif.get_ifd(exifreader.tagGPSInfo)
+    gps[1] = "N"
+    gps[2] = (IFDRational(48, 1), IFDRational(8, 1), IFDRational(1234, 100))
+    gps[3] = "E"
+    gps[4] = (IFDRational(11, 1), IFDRational(34, 1), IFDRational(5, 1))
+    gps[6] = IFDRational(5123, 10)
+    return exif
+
+
+@pytest.mark.parametrize("suffix, imageFormat", [(".jpg", "JPEG"), (".tif", "TIFF")])
+def test_record_matches_pil(tmp_path, suffix, imageFormat):
+    filepath = tmp_path / f"photo{suffix}"
+    Image.new("RGB", (8, 8)).save(filepath, imageFormat, exif=make_exif())
+    with Image.open(filepath) as image:
+        expected = get_exif_record(image.getexif())
+
+    record = get_exif_record(exifreader.read_exif(filepath))
+    assert record == expected
+    assert record.dateTime == "2023:05:01 12:30:05" and record.model == "Canon EOS R5"
+
+
+def test_jpeg_with_gps(tmp_path):
+    # PIL only writes the Exif and GPS IFDs into JPEGs
+    filepath = tmp_path / "photo.jpg"
+    Image.new("RGB", (8, 8)).save(filepath, exif=make_exif())
+    record = get_exif_record(exifreader.read_exif(filepath))
+
+    assert record.dateTimeOriginal == "2023:05:01 12:30:04"
+    assert record.subSecOriginal == "25"
+    assert record.gps[1] == "N" and record.gps[2] == (48.0, 8.0, 12.34) and record.gps[6] == 512.3
+
+
+def test_files_without_exif(tmp_path):
+    Image.new("RGB", (8, 8)).save(tmp_path / "plain.jpg")
+    Image.new("RGB", (8, 8)).save(tmp_path / "plain.png")
+    (tmp_path / "empty.jpg").write_bytes(b"")
+
+    assert exifreader.read_exif(tmp_path / "plain.jpg") == dict()
+    assert exifreader.read_exif(tmp_path / "plain.png") is None # left to PIL
+    assert exifreader.read_exif(tmp_path / "empty.jpg") is None
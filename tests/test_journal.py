@@ -0,0 +1,76 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent)) # run from anywhere: python -m pytest tests
+
+from journal import RenameJournal  # noqa: E402
+from utilities import rename_no_replace  # noqa: E402
+
+
+def run_steps(journal:RenameJournal, steps:list) -> str:
+    runId = journal.begin_run(steps)
+    for index, (source, target) in enumerate(steps):
+        rename_no_replace(source, target)
+        journal.step_done(runId, index, source, target)
+    journal.end_run(runId)
+    return runId
+
+
+def test_finished_runs_are_rotated(tmp_path):
+    # recovery only reads the current journal, undo still finds the rotated runs
+    (tmp_path / "A.jpg").write_text("A")
+    journalPath = tmp_path / "journal.jsonl"
+    with RenameJournal(journalPath, historySize=2) as journal:
+        firstId = run_steps(journal, [(tmp_path / "A.jpg", tmp_path / "B.jpg")])
+        secondId = run_steps(journal, [(tmp_path / "B.jpg", tmp_path / "C.jpg")])
+        assert journalPath.stat().st_size == 0
+        assert journal.read_runs() == dict()
+        assert journal.recover() == []
+        assert list(journal.read_runs(history=True)) == [firstId, secondId]
+
+        journal.undo()
+        assert (tmp_path / "B.jpg").read_text() == "A"
+        assert len(journal.read_runs(history=True)) == 2 # the first run was dropped from the history
+        assert not journal.get_history_path(3).exists()
+
+
+def test_interrupted_run_stays_until_recovered(tmp_path):
+    (tmp_path / "A.jpg").write_text("A")
+    journalPath = tmp_path / "journal.jsonl"
+    journal = RenameJournal(journalPath)
+    runId = journal.begin_run([(tmp_path / "A.jpg", tmp_path / "B.jpg")])
+    journal.close() # crashed before the rename
+
+    with RenameJournal(journalPath) as journal:
+        assert list(journal.read_runs()) == [runId]
+        assert journal.recover("replay") == [(runId, "replay")]
+        assert journal.read_runs() == dict()
+    assert (tmp_path / "B.jpg").read_text() == "A"
+
+
+def test_recovery_collision_does_not_block_startup(tmp_path):
+    # the original name was taken again after the crash, so the rollback can't move the file back
+    (tmp_path / "A.jpg").write_text("A")
+    journalPath = tmp_path / "journal.jsonl"
+    journal = RenameJournal(journalPath)
+    runId = journal.begin_run([(tmp_path / "A.jpg", tmp_path / "B.jpg")])
+    rename_no_replace(tmp_path / "A.jpg", tmp_path / "B.jpg")
+    journal.step_done(runId, 0, tmp_path / "A.jpg", tmp_path / "B.jpg")
+    journal.close() # crashed before the end of the run
+    (tmp_path / "A.jpg").write_text("new")
+
+    with RenameJournal(journalPath) as journal:
+        assert journal.recover("rollback") == [(runId, "failed")]
+        assert journal.recover("rollback") == [] # ended, not tried again on the next start
+        assert journal.read_runs(history=True)[runId]["result"] == "failed"
+    assert (tmp_path / "A.jpg").read_text() == "new"
+    assert (tmp_path / "B.jpg").read_text() == "A"
+
+
+def test_undo_skips_empty_runs(tmp_path):
+    (tmp_path / "A.jpg").write_text("A")
+    with RenameJournal(tmp_path / "journal.jsonl") as journal:
+        runId = run_steps(journal, [(tmp_path / "A.jpg", tmp_path / "B.jpg")])
+        run_steps(journal, []) # a run where every file already had its name
+        assert journal.undo() == (runId, [])
+    assert (tmp_path / "A.jpg").read_text() == "A"
@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent)) # run from anywhere: python -m pytest tests
+
+import ordering  # noqa: E402
+
+day = ordering.get_timestamp("2023", "05", "01", "00", "00", "00")
+
+
+def make_record(scope:str, key:str, timestamp:int, subSec:str = "", directory:str = "/a", model:str = None) -> ordering.SortRecord:
+    scopeKey = ordering.get_scope_key(scope, timestamp, directory, model)
+    return ordering.SortRecord(scopeKey, timestamp, ordering.get_sub_sec(subSec), key.rpartition("/")[2], key)
+
+
+def test_sub_seconds_compare_by_value():
+    assert ordering.get_sub_sec("25") == ordering.get_sub_sec("250") == 250000
+    assert ordering.get_sub_sec("3") > ordering.get_sub_sec("25")
+    assert ordering.get_sub_sec("") == 0
+
+
+def test_global_ids_follow_time_then_sub_second_then_name():
+    records = [
+        make_record("global", "/a/c.jpg", day + 60),
+        make_record("global", "/a/b.jpg", day, "5"),
+        make_record("global", "/a/z.jpg", day),
+        make_record("global", "/a/a.jpg", day),
+    ]
+    ids, digits = ordering.get_iterator_ids(records)
+
+    assert ids == {"/a/a.jpg": 1, "/a/z.jpg": 2, "/a/b.jpg": 3, "/a/c.jpg": 4}
+    assert digits == 1
+
+
+@pytest.mark.parametrize("scope, expected", [
+    ("day", {"/a/1.jpg": 1, "/b/2.jpg": 2, "/a/3.jpg": 1}),
+    ("directory", {"/a/1.jpg": 1, "/b/2.jpg": 1, "/a/3.jpg": 2}),
+    ("model", {"/a/1.jpg": 1, "/b/2.jpg": 1, "/a/3.jpg": 2}),
+])
+def test_scopes_restart_numbering(scope, expected):
+    records = [
+        make_record(scope, "/a/1.jpg", day, directory="/a", model="X"),
+        make_record(scope, "/b/2.jpg", day + 60, directory="/b", model=None),
+        make_record(scope, "/a/3.jpg", day + ordering.secondsPerDay, directory="/a", model="X"),
+    ]
+    assert ordering.get_iterator_ids(records)[0] == expected
+
+
+def test_digits_of_largest_id():
+    records = [make_record("global", f"/a/{number}.jpg", day + number) for number in range(100)]
+    assert ordering.get_iterator_ids(records)[1] == 3
+    assert ordering.get_iterator_ids(records, start=0)[1] == 2
+
+
+def test_invalid_scope():
+    with pytest.raises(ValueError):
+        ordering.get_scope_key("week", day, "/a", None)
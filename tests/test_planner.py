@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent)) # run from anywhere: python -m pytest tests
+
+from planner import RenamePlan  # noqa: E402
+
+
+def write_files(directory:Path, names:dict) -> dict:
+# name -> content, returns name -> path
+    paths = dict()
+    for name, content in names.items():
+        paths[name] = directory / name
+        paths[name].parent.mkdir(parents=True, exist_ok=True)
+        paths[name].write_text(content)
+    return paths
+
+
+def test_chain_into_other_directory_waits_for_vacated_name(tmp_path):
+    # A -> a/B only works after a/B -> z/C, even though z sorts after a
+    paths = write_files(tmp_path, {"src/A.jpg": "A", "a/B.jpg": "B"})
+    plan = RenamePlan([(paths["a/B.jpg"], tmp_path / "z" / "C.jpg"), (paths["src/A.jpg"], paths["a/B.jpg"])])
+    renamed = plan.execute()
+
+    assert (tmp_path / "z" / "C.jpg").read_text() == "B"
+    assert (tmp_path / "a" / "B.jpg").read_text() == "A"
+    assert not (tmp_path / "src" / "A.jpg").exists()
+    assert sorted(path.name for path in (tmp_path / "a").iterdir()) == ["B.jpg"]
+    assert renamed == [(paths["a/B.jpg"], tmp_path / "z" / "C.jpg"), (paths["src/A.jpg"], paths["a/B.jpg"])]
+
+
+def test_cycle_swaps_names(tmp_path):
+    paths = write_files(tmp_path, {"A.jpg": "A", "B.jpg": "B"})
+    plan = RenamePlan([(paths["A.jpg"], paths["B.jpg"]), (paths["B.jpg"], paths["A.jpg"])])
+    plan.execute()
+
+    assert plan.cycles == 1
+    assert paths["A.jpg"].read_text() == "B"
+    assert paths["B.jpg"].read_text() == "A"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["A.jpg", "B.jpg"]
+
+
+def test_external_collision_gets_suffix(tmp_path):
+    # a file that appears after planning keeps its name, the renamed file takes the next free one
+    paths = write_files(tmp_path, {"A.jpg": "A"})
+    plan = RenamePlan([(paths["A.jpg"], tmp_path / "B.jpg")])
+    (tmp_path / "B.jpg").write_text("other")
+    (old, new), = plan.execute()
+
+    assert (tmp_path / "B.jpg").read_text() == "other"
+    assert new != tmp_path / "B.jpg" and new.read_text() == "A"
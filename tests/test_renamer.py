@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent)) # run from anywhere: python -m pytest tests
+
+from mapicture import PhotoRegistry  # noqa: E402
+from renamer import RenameEngine, get_tag_dict_list  # noqa: E402
+from template import DirectoryTemplate  # noqa: E402
+
+tagDateTime = 0x0132
+
+
+def make_photo(path:Path, dateTime:str):
+    exif = Image.Exif()
+    exif[tagDateTime] = dateTime
+    Image.new("RGB", (8, 8)).save(path, exif=exif)
+
+
+def test_registry_follows_shifted_iterators(tmp_path):
+    # an older photo shifts every iterator by one, so the second run is one long chain of renames
+    for minute in range(12):
+        make_photo(tmp_path / f"p{minute}.jpg", f"2023:07:14 10:{minute:02d}:00")
+    registry = PhotoRegistry()
+    engine = RenameEngine(registry)
+    tags = get_tag_dict_list(["YYYY-MM-DD", "###"])
+    engine.rename_all_files(sorted(tmp_path.iterdir()), tags)
+    make_photo(tmp_path / "older.jpg", "2023:07:14 09:00:00")
+    engine.rename_all_files(sorted(tmp_path.iterdir()), tags)
+
+    assert len(registry) == len(registry._keys) == 13
+    for path, key in registry._keys.items():
+        assert str(registry._photos[key].get_path()) == path
+
+    registry.maxSize = 5 # evictions used to fail on keys that were overwritten by a rename
+    make_photo(tmp_path / "oldest.jpg", "2023:07:14 08:00:00")
+    engine.rename_all_files(sorted(tmp_path.iterdir()), tags)
+    assert not engine.errors
+    assert len(registry) == len(registry._keys) == 5
+
+
+def test_folder_sorting_twice_keeps_folders(tmp_path):
+    # without a root the folders are made next to the photos, a second run must not nest them again
+    make_photo(tmp_path / "a.jpg", "2015:01:12 10:00:00")
+    make_photo(tmp_path / "b.jpg", "2015:01:13 10:00:00")
+    tags = get_tag_dict_list(["YYYY-MM-DD", "##"])
+    for batchTable in (True, False):
+        engine = RenameEngine(PhotoRegistry(), batchTable=batchTable, folderTemplate="YYYY/MM-DD")
+        engine.rename_all_files([path for path in tmp_path.rglob("*.jpg")], tags)
+        assert sorted(path.relative_to(tmp_path).as_posix() for path in tmp_path.rglob("*.jpg")) == [
+            "2015/01-12/2015-01-12_01.jpg", "2015/01-13/2015-01-13_02.jpg"]
+
+
+def test_folder_template_needs_relative_folders():
+    for pattern in ("/abs/YYYY", "\\YYYY", "C:/YYYY", "YYYY/../MM", "./YYYY"):
+        with pytest.raises(ValueError):
+            DirectoryTemplate(pattern)
@@ -0,0 +1,68 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent)) # run from anywhere: python -m pytest tests
+
+import ordering  # noqa: E402
+import utilities as util  # noqa: E402
+from mapicture import Photo  # noqa: E402
+from renamer import RenameEngine, get_tag_dict_list  # noqa: E402
+from template import NameTemplate  # noqa: E402
+
+
+def make_photo(path:str, dateTime:tuple, iteratorId:int) -> Photo:
+# a Photo without a file behind it, only the slots naming needs
+    photo = Photo.__new__(Photo)
+    photo._path = path
+    photo._pathOld = None
+    photo._fileType = Path(path).suffix
+    photo._timestamp = ordering.get_timestamp(*dateTime)
+    photo._subSec = 0
+    photo._model = None
+    photo._gps = None
+    photo._size = 0
+    photo._mtimeNs = 0
+    photo._birthtime = None
+    photo._id = iteratorId
+    return photo
+
+
+def legacy_generate_name(photo:Photo, app:object) -> str:
+# the tag walk Photo.generate_name did for every photo before templates were compiled
+    tagList = []
+    for tag in app.tagDictList:
+        text = tag["text"]
+        match tag["category"]:
+            case app._categoryDate:
+                text = photo.adjust_date_tag(text)
+            case app._categoryTime:
+                text = photo.adjust_time_tag(text)
+            case app._categoryIterator:
+                text = photo.adjust_iterator_tag(text)
+        tagList.insert(int(tag["index"]), text)
+    return util.concat_strings(tagList, app.defaultSeparator) + photo.get_file_type()
+
+
+photos = [
+    make_photo("/a/IMG_1.jpg", ("2023", "05", "01", "12", "30", "05"), 1),
+    make_photo("/a/IMG_2.PNG", ("1999", "12", "31", "23", "59", "59"), 42),
+    make_photo("/a/IMG_3.tiff", ("2024", "02", "29", "00", "00", "00"), 1234),
+]
+
+
+@pytest.mark.parametrize("tags, separator", [
+    (["YYYY-MM-DD", "hhmmss", "##"], "_"),
+    (["DD_MM_YYYY", "hh-mm", "holiday", "#"], "-"),
+    (["YYYYMMDD", "###", "{braces}"], ""),
+    (["", "MM", "ss", "####"], "_"),
+    (["holiday"], "_"),
+])
+def test_template_matches_tag_walk(tags, separator):
+    engine = RenameEngine(separator=separator)
+    engine.tagDictList = get_tag_dict_list(tags)
+    template = NameTemplate(engine.tagDictList, separator, engine)
+
+    assert template.render_many(photos) == [legacy_generate_name(photo, engine) for photo in photos]
+    assert [photo.generate_name(engine) for photo in photos] == template.render_many(photos)
@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent)) # run from anywhere: python -m pytest tests
+
+from thumbnails import ThumbnailLoader  # noqa: E402
+
+
+def save_photo(filepath:Path, color:str, mtimeNs:int):
+    Image.new("RGB", (200, 100), color).save(filepath)
+    os.utime(filepath, ns=(mtimeNs, mtimeNs))
+
+
+def get_color(image) -> tuple:
+    return image.getpixel((image.width // 2, image.height // 2))
+
+
+def test_changed_file_gets_a_new_thumbnail(tmp_path):
+    filepath = tmp_path / "photo.jpg"
+    cachePath = tmp_path / "cache"
+    save_photo(filepath, "red", 1_000_000_000_000_000_000)
+    first = ThumbnailLoader(size=48, cachePath=cachePath).load(str(filepath))
+    assert first.size == (48, 24)
+    assert get_color(first)[0] > 200
+
+    save_photo(filepath, "blue", 1_000_000_001_000_000_000) # new content and mtime, the cached red one must not be used
+    second = ThumbnailLoader(size=48, cachePath=cachePath).load(str(filepath))
+    assert get_color(second)[2] > 200
+    assert len(list(cachePath.rglob("*.jpg"))) == 2
+
+
+def test_unchanged_file_is_read_from_disk_cache(tmp_path):
+    filepath = tmp_path / "photo.jpg"
+    cachePath = tmp_path / "cache"
+    save_photo(filepath, "red", 1_000_000_000_000_000_000)
+    ThumbnailLoader(size=48, cachePath=cachePath).load(str(filepath))
+    cacheFile, = cachePath.rglob("*.jpg")
+    Image.new("RGB", (48, 24), "green").save(cacheFile) # marks the cached copy
+
+    cached = ThumbnailLoader(size=48, cachePath=cachePath).load(str(filepath))
+    assert get_color(cached)[1] > 100 and get_color(cached)[0] < 100
+
+
+def test_loader_threads_deliver_requested_paths(tmp_path):
+    filepaths = []
+    for number in range(4):
+        filepaths.append(str(tmp_path / f"{number}.jpg"))
+        save_photo(Path(filepaths[-1]), "red", 1_000_000_000_000_000_000)
+    (tmp_path / "broken.jpg").write_bytes(b"not an image")
+    loader = ThumbnailLoader(size=32, cachePath=None, workers=2)
+    loader.request(filepaths + [str(tmp_path / "broken.jpg")])
+    finished = []
+    while loader.is_busy():
+        finished.extend(loader.get_finished())
+        time.sleep(0.001)
+    loader.close()
+
+    assert sorted(finished) == sorted(filepaths)
+    assert all(loader.get(filepath) is not None for filepath in filepaths)
+    assert loader.get(str(tmp_path / "broken.jpg")) is None
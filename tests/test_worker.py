@@ -0,0 +1,19 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent)) # run from anywhere: python -m pytest tests
+
+from worker import ScanWorker  # noqa: E402
+
+
+def test_scan_worker_streams_every_file(tmp_path):
+    for number in range(5):
+        (tmp_path / f"{number}.jpg").write_bytes(b"")
+    (tmp_path / "notes.txt").write_text("not a photo")
+    scanWorker = ScanWorker(tmp_path, interval=0) # a message for every file
+    scanWorker.start()
+    scanWorker.join()
+    messages = scanWorker.get_messages()
+
+    assert sorted(Path(path).name for message in messages for path in message.paths) == [f"{number}.jpg" for number in range(5)]
+    assert [message.finished for message in messages] == [False] * (len(messages) - 1) + [True]
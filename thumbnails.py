@@ -0,0 +1,183 @@
+import hashlib
+import io
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import exifreader
+import formats
+import instrumentation
+from settings import Settings
+
+# Small previews for the file list, made without decoding the full image:
+# the JPEG thumbnail most cameras embed in the EXIF data, otherwise a draft decode (JPEGs are decoded at 1/8 scale).
+# A few background threads generate them, the GUI only asks for the visible rows and polls for finished ones.
+# Finished thumbnails are kept in an in-memory LRU and on disk, named after the identity of the file content
+# (device, inode, size and mtime), so they survive renames and never belong to a changed file.
+# usage: python thumbnails.py <image file> [...] (times generating the thumbnails without any cache)
+
+# EXIF orientation -> PIL transpose method that turns the image upright (see ImageOps.exif_transpose)
+orientationTransposes = {
+    2: "FLIP_LEFT_RIGHT",
+    3: "ROTATE_180",
+    4: "FLIP_TOP_BOTTOM",
+    5: "TRANSPOSE",
+    6: "ROTATE_270",
+    7: "TRANSVERSE",
+    8: "ROTATE_90",
+}
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: python thumbnails.py <image file> [...]")
+        return
+    for filepath in sys.argv[1:]:
+        start = time.perf_counter()
+        thumbnail = make_thumbnail(filepath)
+        print(f"{filepath}: {thumbnail.size[0]}x{thumbnail.size[1]} in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+def make_thumbnail(filepath, size:int = Settings.thumbnailSize):
+# RGB image that fits into size x size, upright
+    from PIL import Image
+
+    embedded = exifreader.read_thumbnail(filepath)
+    if embedded is not None:
+        instrumentation.count("thumbnail.embedded")
+        image = Image.open(io.BytesIO(embedded))
+        orientation = exifreader.read_exif(filepath, frozenset({exifreader.tagOrientation})).get(exifreader.tagOrientation, 1)
+        if max(image.size) >= size: # some cameras only embed tiny previews
+            return fit(image, size, orientation)
+
+    instrumentation.count("thumbnail.decoded")
+    with formats.open_image(filepath) as image:
+        image.draft("RGB", (size, size)) # JPEG only, still at least size x size
+        orientation = image.getexif().get(exifreader.tagOrientation, 1)
+        return fit(image, size, orientation)
+
+
+def fit(image, size:int, orientation:int = 1):
+    from PIL import Image
+
+    image = image.convert("RGB")
+    image.thumbnail((size, size), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    if orientation in orientationTransposes:
+        image = image.transpose(getattr(Image.Transpose, orientationTransposes[orientation]))
+    return image
+
+
+def get_cache_key(stat:os.stat_result, size:int) -> str:
+    identity = f"{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}:{size}"
+    return hashlib.blake2b(identity.encode(), digest_size=16).hexdigest()
+
+
+class ThumbnailLoader:
+    def __init__(self, size:int = Settings.thumbnailSize, cachePath = Settings.thumbnailCachePath,
+                 memorySize:int = Settings.thumbnailMemorySize, workers:int = Settings.thumbnailWorkers):
+        self.size = size
+        self.cachePath = cachePath # directory of the disk cache, None keeps thumbnails in memory only
+        self.memorySize = memorySize
+        self.workers = workers
+        self._images = OrderedDict() # path -> PIL image, least recently used first
+        self._failed = set() # paths that couldn't be read, not tried again
+        self._pending = [] # paths still to load, the last one is loaded next
+        self._loading = set()
+        self._finished = [] # paths loaded since the last get_finished()
+        self._threads = []
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def get(self, filepath):
+    # the thumbnail if it is in memory, never blocks
+        with self._condition:
+            image = self._images.get(filepath)
+            if image is not None:
+                self._images.move_to_end(filepath)
+            return image
+
+    def request(self, filepaths:list):
+    # replaces all pending requests, so rows that were scrolled past are not loaded anymore
+    # the first path is loaded first
+        with self._condition:
+            self._pending = [path for path in reversed(filepaths)
+                             if path not in self._images and path not in self._failed and path not in self._loading]
+            while len(self._threads) < min(self.workers, len(self._pending)):
+                thread = threading.Thread(target=self._run, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._condition.notify_all()
+
+    def get_finished(self) -> list:
+    # paths whose thumbnails were loaded since the last call
+        with self._condition:
+            finished = self._finished
+            self._finished = []
+            return finished
+
+    def is_busy(self) -> bool:
+        with self._condition:
+            return bool(self._pending or self._loading or self._finished)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._pending.clear()
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                filepath = self._pending.pop()
+                self._loading.add(filepath)
+
+            try:
+                with instrumentation.timer("thumbnail.load"):
+                    image = self.load(filepath)
+            except Exception as error: # broken or vanished file, the row simply stays without preview
+                print(f"No thumbnail for {filepath}: {error}")
+                image = None
+
+            with self._condition:
+                self._loading.discard(filepath)
+                if image is None:
+                    self._failed.add(filepath)
+                    continue
+                self._images[filepath] = image
+                while len(self._images) > self.memorySize:
+                    self._images.popitem(last=False)
+                self._finished.append(filepath)
+
+    def load(self, filepath):
+    # from the disk cache if possible, otherwise made and written to it
+        from PIL import Image
+
+        if self.cachePath is None:
+            return make_thumbnail(filepath, self.size)
+
+        key = get_cache_key(os.stat(filepath), self.size)
+        cacheFile = os.path.join(self.cachePath, key[:2], key + ".jpg")
+        try:
+            with Image.open(cacheFile) as cached:
+                image = cached.convert("RGB") # a copy that stays usable once the file is closed
+            instrumentation.count("thumbnail.disk_hit")
+            return image
+        except (OSError, ValueError): # not cached yet (or a broken cache file, which is overwritten)
+            pass
+
+        image = make_thumbnail(filepath, self.size)
+        os.makedirs(os.path.dirname(cacheFile), exist_ok=True)
+        temporaryFile = f"{cacheFile}.{threading.get_ident()}.tmp"
+        image.save(temporaryFile, "JPEG", quality=85)
+        os.replace(temporaryFile, cacheFile) # other threads never see half written files
+        return image
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
 
+import os
+import re
 from pathlib import Path
 
-from PIL import Image
+import instrumentation
+
+
+duplicateSuffixPattern = re.compile(r"^(.*)__(\d+)(\.[^.]*)?$") # name__2.jpg -> ("name", "2", ".jpg")
 
 
 def main():
@@ -34,19 +39,117 @@ def get_filename(filepath:str):
     path= Path(filepath)
     return path.stem + path.suffix
 
-def rename_file(pathOld:Path, pathNew:Path):
+@instrumentation.timed("rename.file")
+def rename_file(pathOld:Path, pathNew:Path, nameIndex:"DirectoryNameIndex" = None) -> Path:
+# renames without ever replacing an existing file, returns the path that was actually used
+# with a DirectoryNameIndex of the target directory the next free duplicate suffix is known right away
+    if nameIndex is not None:
+        while True:
+            target = pathNew.with_name(nameIndex.claim(pathNew.name))
+            try:
+                rename_no_replace(pathOld, target)
+            except FileExistsError: # created by another process in the meantime, claim() already marked it as taken
+                instrumentation.count("rename.collision_retry")
+                continue
+            if pathOld.parent == target.parent:
+                nameIndex.discard(pathOld.name)
+            return target
+
     duplicateSuffix = 2
+    target = pathNew
     while True:
         try:
-            pathOld.rename(pathNew)
-            break
-        except FileExistsError:
-            try: # try with initial duplicate value
-                tempPath = add_duplicate_suffix(pathNew, duplicateSuffix)
-                pathOld.rename(tempPath)
+            rename_no_replace(pathOld, target)
+            return target
+        except FileExistsError: # loop until duplicate is big enough
+            instrumentation.count("rename.collision_retry")
+            target = add_duplicate_suffix(pathNew, duplicateSuffix)
+            duplicateSuffix += 1
+
+@instrumentation.timed("rename.syscall")
+def rename_no_replace(pathOld:Path, pathNew:Path):
+# atomic rename that raises FileExistsError instead of replacing pathNew
+    if os.name == "nt": # Windows never replaces on rename
+        os.rename(pathOld, pathNew)
+        return
+
+    # POSIX rename silently replaces, but creating a hard link fails if the name exists
+    try:
+        os.link(pathOld, pathNew)
+    except FileExistsError:
+        raise
+    except OSError: # file system without hard links, fall back to a (non-atomic) check
+        if os.path.lexists(pathNew):
+            raise FileExistsError(f"{pathNew} already exists")
+        os.rename(pathOld, pathNew)
+        return
+    os.unlink(pathOld)
+
+
+class DirectoryNameIndex:
+# Names of a directory, loaded once with scandir and updated as files are renamed.
+# Keeps the lowest possibly free duplicate suffix for every wanted name (all suffixes below it are taken),
+# so claim() never retries a name it already knows is taken.
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._names = set()
+        self._nextSuffix = dict() # wanted name -> lowest duplicate suffix that might be free
+        try:
+            with os.scandir(self.directory) as iterator:
+                for entry in iterator:
+                    self.add(entry.name)
+        except FileNotFoundError:
+            pass
+
+    def __contains__(self, name:str) -> bool:
+        return os.path.normcase(name) in self._names
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, name:str):
+        self._names.add(os.path.normcase(name))
+
+    def discard(self, name:str):
+        key = os.path.normcase(name)
+        self._names.discard(key)
+        match = duplicateSuffixPattern.match(key)
+        if match: # a freed duplicate suffix is the next one to use again
+            baseName = match.group(1) + (match.group(3) or "")
+            self._nextSuffix[baseName] = min(self._nextSuffix.get(baseName, 2), int(match.group(2)))
+
+    def claim(self, name:str) -> str:
+    # returns name, or name with the next free duplicate suffix, and marks it as taken
+        key = os.path.normcase(name)
+        if key not in self._names:
+            self.add(name)
+            return name
+
+        counter = self._nextSuffix.get(key, 2)
+        while True:
+            candidate = add_duplicate_suffix(Path(name), counter).name
+            counter += 1
+            if os.path.normcase(candidate) not in self._names:
                 break
-            except FileExistsError: # otherwise loop until duplicate is big enough
-                duplicateSuffix += 1
+        self._nextSuffix[key] = counter
+        self.add(candidate)
+        return candidate
+
+
+class DirectoryCache:
+# Directories known to exist, so moving many files into the same folders only creates (or checks) each folder once
+    def __init__(self):
+        self._known = set()
+
+    def ensure(self, directory):
+        key = os.path.normcase(os.path.abspath(directory))
+        if key in self._known:
+            return
+        instrumentation.count("directory.makedirs")
+        os.makedirs(directory, exist_ok=True)
+        while key not in self._known: # its parents exist now as well
+            self._known.add(key)
+            key = os.path.dirname(key)
 
 
 def add_duplicate_suffix(path:Path, counter:int)->Path:
@@ -60,18 +163,20 @@ def add_duplicate_suffix(path:Path, counter:int)->Path:
 
 def concat_strings(strList:list, separator):
 # takes a list of words and a separator and returns the concatenated string
+# leading empty words don't get a separator
 
-    outStr = ""
-    for word in strList:
-        if outStr == "":
-            outStr = outStr + word
-        else:
-            outStr = outStr + separator + word
-    return outStr
+    words = list(strList)
+    start = 0
+    while start < len(words) and words[start] == "":
+        start += 1
+    return separator.join(words[start:])
 
 # Credit for this function to user Primoz on Stackoverflow thread:
 # https://stackoverflow.com/questions/71112986/retrieve-a-list-of-supported-read-file-extensions-formats
 def get_PIL_supported_formats():
+# slow, initializes every PIL plugin (formats.supportedFormats is the precomputed version)
+    from PIL import Image
+
     exts = Image.registered_extensions()
     supported_extensions = {ex for ex, f in exts.items() if f in Image.OPEN}
     return supported_extensions
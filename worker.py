@@ -0,0 +1,124 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import instrumentation
+from renamer import RenameEngine
+from scanner import scan_directory
+from settings import Settings
+
+# Runs a rename batch (or a folder scan) on a background thread so the window stays responsive.
+# The thread only talks to the GUI through a queue of messages, which the GUI polls with after().
+
+# sent while running, rate in files per second and eta in seconds (None until known)
+Progress = namedtuple("Progress", ["stage", "done", "total", "errors", "rate", "eta"])
+# sent once at the end, error is the exception that aborted the run (None otherwise)
+Finished = namedtuple("Finished", ["renamed", "errors", "cancelled", "error"])
+# sent by a ScanWorker every interval with the files found since the last one, finished on the last message
+Scanned = namedtuple("Scanned", ["paths", "finished"])
+
+
+class RenameWorker(threading.Thread):
+    def __init__(self, engine:RenameEngine, filepaths:list, tagDictList:list, interval:float = Settings.progressInterval):
+        super().__init__(daemon=True) # an interrupted run is cleaned up by the journal on the next start
+        self.engine = engine
+        self.filepaths = list(filepaths)
+        self.tagDictList = tagDictList
+        self.interval = interval # seconds between progress messages
+        self.messages = queue.Queue()
+        self._total = len(self.filepaths)
+        self._stage = None
+        self._stageStart = None
+        self._lastReport = 0.0
+        self.engine.cancelEvent.clear()
+
+    def cancel(self):
+    # the engine stops after the current file (reading) or chain of renames (renaming)
+        self.engine.cancel()
+
+    def run(self):
+        instrumentation.reset()
+        self.engine.onProgress = self.on_progress
+        renamed = []
+        error = None
+        try:
+            plan = self.engine.plan_renames(self.filepaths, self.tagDictList)
+            if not self.engine.cancelEvent.is_set():
+                self._total = len(plan.steps)
+                renamed = self.engine.execute_plan(plan)
+                self.log_renames(renamed)
+        except Exception as runError: # reported to the GUI instead of silently ending the thread
+            error = runError
+        finally:
+            self.engine.onProgress = None
+            instrumentation.export(Settings.statsPath)
+            self.messages.put(Finished(renamed, list(self.engine.errors), self.engine.cancelEvent.is_set(), error))
+
+    def log_renames(self, renamed:list):
+    # a summary with the first few renames, the journal has all of them
+        for pathOld, pathNew in renamed[:Settings.renameLogSize]:
+            print(f"Renamed {pathOld} to {pathNew}")
+        if len(renamed) > Settings.renameLogSize:
+            print(f"... and {len(renamed) - Settings.renameLogSize} more")
+        print(f"Renamed {len(renamed)} files")
+
+    def on_progress(self, stage:str, done:int):
+    # called by the engine for every file, only sends a message every interval (and for the last file)
+        now = time.monotonic()
+        if stage != self._stage:
+            self._stage = stage
+            self._stageStart = now
+        if done < self._total and now - self._lastReport < self.interval:
+            return
+        self._lastReport = now
+
+        elapsed = now - self._stageStart
+        rate = done / elapsed if elapsed > 0 else None
+        eta = (self._total - done) / rate if rate else None
+        self.messages.put(Progress(stage, done, self._total, len(self.engine.errors), rate, eta))
+
+    def get_messages(self) -> list:
+    # all messages sent since the last call, never blocks
+        return get_messages(self.messages)
+
+
+class ScanWorker(threading.Thread):
+# Streams the files of a folder to the GUI while scan_directory walks it
+    def __init__(self, directory, interval:float = Settings.progressInterval):
+        super().__init__(daemon=True)
+        self.directory = directory
+        self.interval = interval # seconds between messages
+        self.messages = queue.Queue()
+        self.cancelEvent = threading.Event()
+
+    def cancel(self):
+        self.cancelEvent.set()
+
+    def run(self):
+        paths = []
+        lastReport = time.monotonic()
+        try:
+            for entry in scan_directory(self.directory):
+                if self.cancelEvent.is_set():
+                    break
+                paths.append(entry.path)
+                if time.monotonic() - lastReport >= self.interval:
+                    self.messages.put(Scanned(paths, False))
+                    paths = []
+                    lastReport = time.monotonic()
+        finally:
+            self.messages.put(Scanned(paths, True))
+
+    def get_messages(self) -> list:
+        return get_messages(self.messages)
+
+
+def get_messages(messageQueue:queue.Queue) -> list:
+# all messages sent since the last call, never blocks
+    messages = []
+    while True:
+        try:
+            messages.append(messageQueue.get_nowait())
+        except queue.Empty:
+            return messages